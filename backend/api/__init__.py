@@ -25,9 +25,7 @@ async def lifespan(app: FastAPI):
     main_loop = asyncio.get_running_loop()
     await lib_mgr.switch_library(backend.config.comic_path, main_loop)
     yield
-    if lib_mgr.observer and lib_mgr.observer.is_alive():
-        lib_mgr.observer.stop()
-        lib_mgr.observer.join()
+    lib_mgr.stop_watching()
     close_cbz_cache()
 
 
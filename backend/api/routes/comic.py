@@ -5,16 +5,22 @@
 import asyncio
 import platform
 from pathlib import Path
+from typing import Optional
 from fastapi import APIRouter, Query, HTTPException
 from pydantic import BaseModel
 from starlette.requests import Request
-from starlette.responses import Response
+from starlette.responses import Response, JSONResponse, StreamingResponse
 
 from infra import backend
-from utils import executor
+from utils import Priority, scheduler
 from utils.file_handlers import execute_handle, cleanup_empty_dir
 from utils.cbz_cache import get_cbz_cache
-from api.schemas import not_found, no_content, bad_request, ErrorMessages, get_mime_type, validate_directory, ComicHandleRequest
+from utils.cbz_index import get_cbz_index, archive_version, st_mtime_from_ns
+from api.schemas import (
+    not_found, no_content, bad_request, not_modified, etag_matches, modified_since, http_date, parse_range,
+    range_not_satisfiable, IMMUTABLE_CACHE_CONTROL,
+    ErrorMessages, get_mime_type, validate_directory, ComicHandleRequest, ComicPagesBatchRequest
+)
 from models import QuerySort
 from core import lib_mgr, BooksAggregator
 from storage import StorageBackendFactory
@@ -22,6 +28,10 @@ from api.routes.root import require_lock
 
 
 index_router = APIRouter(prefix='/comic')
+DEFAULT_PAGE_SIZE = 100
+MAX_BATCH_ITEMS = 100
+# 所有批量请求共享的并发上限，避免单个批量请求占满交互线程
+_batch_semaphore = asyncio.Semaphore(8)
 
 
 async def ensure_library_loaded():
@@ -30,16 +40,34 @@ async def ensure_library_loaded():
 
 
 @index_router.get("/")
-async def get_books(request: Request, sort: str = Query(None)):
+async def get_books(request: Request, sort: str = Query(None), view: str = Query(None),
+                    cursor: str = Query(None), limit: int = Query(None, ge=1, le=1000)):
     await ensure_library_loaded()
     cache = lib_mgr.active_cache
     if not cache or not cache.books_index:
         return no_content()
-    books = list(cache.books_index.values())
+    # 版本号未变化时直接 304，不排序、不聚合、不序列化
+    etag = cache.etag
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
     qs = QuerySort(sort or "time_desc")
+    if view == "series":
+        # 只返回系列摘要，章节列表经 /comic/series/{book}/eps 按需获取
+        summaries = cache.series_summaries(qs.func, qs.reverse)
+        return JSONResponse([s.to_api() for s in summaries], headers={"ETag": etag, "Cache-Control": "no-cache"})
     if qs.func == 'name':
-        qs.check_name(books)
-    return BooksAggregator(sorted(books, key=qs.sort_key, reverse=qs.reverse)).to_result()
+        qs.check_name(cache.section_covered())
+    if cursor or limit:
+        # cursor 分页模式：基于系列有序索引取一页完整系列（limit 为系列数），不做全量排序
+        try:
+            groups, next_cursor = cache.page_books(qs.func, qs.reverse, cursor, limit or DEFAULT_PAGE_SIZE)
+        except ValueError as e:
+            return bad_request(str(e))
+        return JSONResponse({"books": BooksAggregator.from_groups(groups), "next_cursor": next_cursor},
+                            headers={"ETag": etag, "Cache-Control": "no-cache"})
+    books = list(cache.books_index.values())
+    return JSONResponse(BooksAggregator(sorted(books, key=qs.sort_key, reverse=qs.reverse)).to_result(),
+                        headers={"ETag": etag, "Cache-Control": "no-cache"})
 
 
 class ConfContent(BaseModel):
@@ -119,12 +147,59 @@ async def list_filesystem(path: str = None):
 
 @index_router.post("/force_rescan")
 @require_lock("force_rescan")
-async def force_rescan():
+async def force_rescan(full: bool = False):
     await ensure_library_loaded()
-    result = await lib_mgr.force_rescan(asyncio.get_running_loop())
+    result = await lib_mgr.force_rescan(asyncio.get_running_loop(), full=full)
     return bad_request(result) if "error" in result else result
 
 
+@index_router.get("/search")
+async def search_books(q: str = Query(..., min_length=1, max_length=200),
+                       limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=1000), offset: int = Query(0, ge=0)):
+    await ensure_library_loaded()
+    cache = lib_mgr.active_cache
+    if not cache or not q.strip():
+        return {"results": [], "next_offset": None}
+    books, has_more = await scheduler.run(Priority.INTERACTIVE, cache.search_books, q, limit, offset)
+    return {"results": [b.to_api() for b in books], "next_offset": offset + limit if has_more else None}
+
+
+@index_router.get("/series/{book}/eps")
+async def get_series_eps(request: Request, book: str):
+    await ensure_library_loaded()
+    cache = lib_mgr.active_cache
+    if not cache:
+        return no_content()
+    etag = cache.etag
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    if (eps := cache.series_episodes(book)) is None:
+        return not_found(ErrorMessages.book_not_exist(book))
+    return JSONResponse([{"ep": e.ep, "first_img": e.to_api()["first_img"], "mtime": e.mtime} for e in eps],
+                        headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+@index_router.get("/scan_progress")
+async def get_scan_progress():
+    await ensure_library_loaded()
+    return {"ero": lib_mgr.ero, **lib_mgr.active_cache.progress.to_dict()}
+
+
+@index_router.get("/scheduler_stats")
+async def get_scheduler_stats():
+    return scheduler.get_stats()
+
+
+@index_router.get("/cbz_stats")
+async def get_cbz_stats():
+    return {**get_cbz_cache().get_stats(), 'index': get_cbz_index().get_stats()}
+
+
+@index_router.get("/watcher_stats")
+async def get_watcher_stats():
+    return lib_mgr.watcher.get_stats() if lib_mgr.watcher else None
+
+
 @index_router.get("/switch_ero")
 async def get_ero_status():
     return lib_mgr.ero
@@ -139,10 +214,33 @@ async def switch_ero(enable: bool = True):
 
 @index_router.get("/{book_name}")
 async def get_book(request: Request, book_name: str, ep: str = None, hard_refresh: bool = False):
-    pages_obj = await lib_mgr.active_pages_handler.get_pages(book_name, ep, hard_refresh)
+    pages_handler = lib_mgr.active_pages_handler
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and not hard_refresh:
+        if (etag := pages_handler.peek_etag(book_name, ep)) and etag_matches(if_none_match, etag):
+            return not_modified(etag)
+    pages_obj = await pages_handler.get_pages(book_name, ep, hard_refresh)
     if not pages_obj or not pages_obj.get("pages"):
         return not_found(ErrorMessages.book_not_exist(book_name))
-    return pages_obj.get("pages")
+    return JSONResponse(pages_obj.get("pages"), headers={"ETag": pages_obj["etag"], "Cache-Control": "no-cache"})
+
+
+@index_router.post("/pages_batch")
+async def get_pages_batch(batch: ComicPagesBatchRequest):
+    if len(batch.items) > MAX_BATCH_ITEMS:
+        return bad_request(f"too many items, max {MAX_BATCH_ITEMS}")
+    await ensure_library_loaded()
+    pages_handler = lib_mgr.active_pages_handler
+
+    async def resolve(book: str, ep: str):
+        async with _batch_semaphore:
+            pages_obj = await pages_handler.get_pages(book, ep)
+        if not pages_obj or not pages_obj.get("pages"):
+            return {"book": book, "ep": ep, "error": ErrorMessages.book_not_exist(book)}
+        return {"book": book, "ep": ep, "pages": pages_obj["pages"], "etag": pages_obj["etag"]}
+
+    keys = list(dict.fromkeys((item.book, item.ep or None) for item in batch.items))
+    return {"results": await asyncio.gather(*(resolve(book, ep) for book, ep in keys))}
 
 
 def _handle_and_cleanup(book_path: Path, handle_type: str, dest: Path, series_dir: Path):
@@ -163,14 +261,41 @@ async def handle(request: Request, book: ComicHandleRequest):
     cache.backend.invalidate_book_cache(book_path)
     series_dir = book_path.parent if ep_name else None
     dest = cache.backend.build_save_path(book_name, book_path.name if ep_name else "")
-    lp = asyncio.get_event_loop()
-    lp.run_in_executor(executor, _handle_and_cleanup, book_path, book.handle, dest, series_dir)
+    scheduler.submit(Priority.MAINTENANCE, _handle_and_cleanup, book_path, book.handle, dest, series_dir)
     cache.set_handle(book_name, ep_name, book.handle)
     return {"book": book_name, "ep": book.ep, "handled": f"{book.handle}d"}
 
 
+async def _iter_scheduled(chunks):
+    """在调度器的交互优先级线程中逐块推进同步迭代器"""
+    future = None
+    try:
+        while True:
+            future = scheduler.submit(Priority.INTERACTIVE, next, chunks, None)
+            if (chunk := await asyncio.wrap_future(future)) is None:
+                break
+            yield chunk
+    finally:
+        # 客户端断开时可能仍有 next 在调度线程中执行：未开始的直接取消，已开始的等其结束后再关闭迭代器
+        if future is None:
+            chunks.close()
+        else:
+            future.cancel()
+            future.add_done_callback(lambda _: chunks.close())
+
+
+def _cbz_cache_headers(index, entry, version: Optional[str]) -> dict:
+    """ETag 由成员 CRC32 与归档 mtime 组成，只依赖中央目录；URL 版本与当前归档一致时允许 immutable 缓存"""
+    mtime = st_mtime_from_ns(index.mtime_ns)
+    return {
+        "ETag": f'"{entry.crc:08x}-{index.mtime_ns:x}"',
+        "Last-Modified": http_date(mtime),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if version == archive_version(mtime) else "no-cache",
+    }
+
+
 @index_router.get("/cbz_image/{book_name}/{image_path:path}")
-async def get_cbz_image(book_name: str, image_path: str):
+async def get_cbz_image(request: Request, book_name: str, image_path: str, v: Optional[str] = None):
     scan_path = lib_mgr.active_cache.scan_path
     if book_name.lower().endswith('.cbz'):
         cbz_path = scan_path / book_name[:-4] / book_name
@@ -178,7 +303,49 @@ async def get_cbz_image(book_name: str, image_path: str):
         cbz_path = scan_path / book_name / image_path.split('/')[0]
     if not cbz_path.is_file() or cbz_path.suffix.lower() != '.cbz':
         return not_found("CBZ file not found")
-    image_data = await asyncio.get_event_loop().run_in_executor(executor, get_cbz_cache().extract_image, cbz_path, image_path)
-    if image_data is None:
+    media_type = get_mime_type(Path(image_path).suffix.lower())
+    # 条件请求只查成员索引（中央目录），命中时不读取成员数据
+    index = await scheduler.run(Priority.INTERACTIVE, get_cbz_index().get, cbz_path)
+    cbz_cache = get_cbz_cache()
+    if index is None or (entry := index.members.get(image_path.split('/')[-1])) is None:
+        # 中央目录无法解析或索引未收录该成员：回退到 ZipFile 读取，不带依赖索引的 ETag / immutable 缓存头
+        image_data = await scheduler.run(Priority.INTERACTIVE, cbz_cache.extract_image, cbz_path, image_path)
+        if image_data is None:
+            return not_found("Image not found in CBZ")
+        return Response(content=image_data, media_type=media_type)
+    headers = _cbz_cache_headers(index, entry, v)
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(if_none_match, headers["ETag"]) or (
+            not if_none_match and not modified_since(request.headers.get("if-modified-since"),
+                                                     st_mtime_from_ns(index.mtime_ns))):
+        return not_modified(headers["ETag"], headers["Cache-Control"])
+    member = await scheduler.run(Priority.INTERACTIVE, cbz_cache.locate_member, cbz_path, image_path)
+    if member is None:
         return not_found("Image not found in CBZ")
-    return Response(content=image_data, media_type=get_mime_type(Path(image_path).suffix.lower()))
+    if not member.streamable:
+        # 已加密或非 stored/deflate 压缩：回退到整体解压
+        image_data = await scheduler.run(Priority.INTERACTIVE, cbz_cache.extract_image, cbz_path, image_path)
+        if image_data is None:
+            return not_found("Image not found in CBZ")
+        return Response(content=image_data, media_type=media_type, headers=headers)
+    if not member.stored:
+        # 压缩成员优先用解压字节缓存；值得缓存时整体解压一次，否则边读边解压
+        image_data = cbz_cache.get_cached_image(member)
+        if image_data is None and cbz_cache.should_buffer(member):
+            image_data = await scheduler.run(Priority.INTERACTIVE, cbz_cache.extract_image, cbz_path, image_path)
+        if image_data is not None:
+            return Response(content=image_data, media_type=media_type, headers=headers)
+    # stored 成员直接从 .cbz 的数据区偏移流式读取并支持 Range
+    start, end, status_code = 0, member.file_size - 1, 200
+    if member.stored:
+        headers["Accept-Ranges"] = "bytes"
+        try:
+            byte_range = parse_range(request.headers.get("range"), member.file_size)
+        except ValueError:
+            return range_not_satisfiable(member.file_size)
+        if byte_range:
+            (start, end), status_code = byte_range, 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{member.file_size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(_iter_scheduled(cbz_cache.iter_member(member, start, end)), status_code=status_code,
+                             media_type=media_type, headers=headers)
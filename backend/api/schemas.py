@@ -1,8 +1,9 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 """API 响应、请求模型和常量"""
+from email.utils import formatdate, parsedate_to_datetime
 from pathlib import Path
-from typing import Optional, Literal
+from typing import List, Optional, Literal
 from pydantic import BaseModel
 from starlette.responses import JSONResponse, Response
 
@@ -35,6 +36,65 @@ def bad_request(message: str = "Bad request") -> JSONResponse:
     return JSONResponse(content=message, status_code=400)
 
 
+# 带版本号的资源 URL 内容不会再变化，允许长期缓存
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def not_modified(etag: str, cache_control: str = "no-cache") -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def modified_since(if_modified_since: Optional[str], mtime: float) -> bool:
+    """按 If-Modified-Since 判断资源是否有更新（秒级精度）；缺失或无法解析时视为有更新"""
+    if not if_modified_since:
+        return True
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return True
+    return int(mtime) > since
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """按弱比较规则判断 If-None-Match 是否命中当前 ETag"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    strip_weak = lambda t: t.strip().removeprefix("W/")
+    return strip_weak(etag) in {strip_weak(t) for t in if_none_match.split(",")}
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[tuple]:
+    """解析单段 Range 头，返回 (start, end)（end 含）；无 Range、多段或区间无效（start > end）时返回 None，
+
+    起点超出文件大小或后缀长度为 0 时不可满足，抛出 ValueError
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_s, _, end_s = range_header[6:].strip().partition("-")
+    if not (start_s or end_s).isdigit() or (start_s and end_s and not end_s.isdigit()):
+        return None  # 语法错误按无 Range 处理
+    if not start_s:  # bytes=-N：最后 N 字节
+        if int(end_s) == 0 or size == 0:
+            raise ValueError(range_header)
+        return max(size - int(end_s), 0), size - 1
+    start = int(start_s)
+    if end_s and int(end_s) < start:
+        return None  # 无效区间按无 Range 处理，返回完整内容
+    if start >= size:
+        raise ValueError(range_header)
+    return start, min(int(end_s), size - 1) if end_s else size - 1
+
+
+def range_not_satisfiable(size: int) -> Response:
+    return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+
+
 def validate_directory(path: Path) -> Optional[JSONResponse]:
     """验证路径是否存在且为目录，失败返回 JSONResponse"""
     if not path.exists() or not path.is_dir():
@@ -66,6 +126,17 @@ class ComicHandleRequest(BaseModel):
     handle: HandleType
 
 
+class BookEpisodeRef(BaseModel):
+    """书籍/章节引用"""
+    book: str
+    ep: Optional[str] = None
+
+
+class ComicPagesBatchRequest(BaseModel):
+    """批量获取页面列表请求"""
+    items: List[BookEpisodeRef]
+
+
 class KemonoHandleRequest(BaseModel):
     """Kemono handle 请求"""
     u_s: str
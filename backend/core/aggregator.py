@@ -1,12 +1,6 @@
-import re
 from collections import defaultdict
 
 
-def _extract_num(ep: str) -> int:
-    """提取章节名中的数字用于排序，提取失败返回0"""
-    return int(m.group()) if (m := re.search(r'\d+', ep)) else 0
-
-
 class BooksAggregator:
     """将 BookData 列表聚合为 API 响应格式"""
     
@@ -17,19 +11,35 @@ class BooksAggregator:
     
     def _classify(self, books):
         for book_data in books:
-            api = book_data.to_api()
             if book_data.ep:
-                self.grouped[book_data.book].append(api)
+                self.grouped[book_data.book].append(book_data)
             else:
-                self.singles.append({"book": api["book"], "first_img": api["first_img"]})
+                self.singles.append({"book": book_data.book, "first_img": book_data.to_api()["first_img"]})
     
     def to_result(self) -> list:
         result = self.singles.copy()
         for book_name, eps in self.grouped.items():
-            eps.sort(key=lambda x: _extract_num(x["ep"]))
-            result.append({
-                "book": book_name,
-                "first_img": eps[0]["first_img"],
-                "eps": [{"ep": e["ep"], "first_img": e["first_img"]} for e in eps]
-            })
-        return result
\ No newline at end of file
+            result.append(self._series_item(book_name, eps))
+        return result
+
+    @classmethod
+    def from_groups(cls, groups: list) -> list:
+        """按系列分组的条目（cursor 分页的一页）聚合为响应，保持系列顺序"""
+        result = []
+        for books in groups:
+            aggregator = cls(books)
+            result.extend(aggregator.singles)
+            for book_name, eps in aggregator.grouped.items():
+                result.append(cls._series_item(book_name, eps))
+        return result
+
+    @staticmethod
+    def _series_item(book_name: str, eps: list) -> dict:
+        # ep_num 在 BookData 创建时已提取，这里只做键比较
+        eps.sort(key=lambda x: x.ep_num)
+        eps = [e.to_api() for e in eps]
+        return {
+            "book": book_name,
+            "first_img": eps[0]["first_img"],
+            "eps": [{"ep": e["ep"], "first_img": e["first_img"]} for e in eps]
+        }
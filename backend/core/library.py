@@ -1,71 +1,431 @@
+import time
 import asyncio
+import functools
 import threading
 import contextlib
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from typing import Optional
+from dataclasses import dataclass
 
-from watchdog.observers import Observer
 from .logging import get_logger
 from .pages import BookPagesHandler
-from .watcher import ComicChangeHandler
+from .watcher import LibraryWatcher
+from .ordering import SortedIndex, encode_cursor, decode_cursor
 
-from utils import Var
+from infra import backend
+from utils import Var, Priority, scheduler
 from utils.cbz_cache import close_cbz_cache
-from models import BookData
+from utils.cbz_index import get_cbz_index
+from utils.scan_engine import ScanEngine
+from models import BookData, BooksIndex, SeriesIndex
 from storage import StorageBackendFactory
 
 
 logger = get_logger()
 
+
+@dataclass
+class ScanProgress:
+    kind: str = "idle"
+    running: bool = False
+    series_done: int = 0
+    series_total: int = 0
+    books_scanned: int = 0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0
+        return {
+            "kind": self.kind, "running": self.running,
+            "scanned": self.books_scanned, "series_done": self.series_done, "series_total": self.series_total,
+            "elapsed": round(elapsed, 2), "rate": round(self.books_scanned / elapsed, 1) if elapsed else 0,
+        }
+
+
 class ComicCacheManager:
+    SCAN_CHUNK_SIZE = 2000  # 每块提交的条目数
+    ENTRY_BYTES = 230  # 每个 BookData 条目（含紧凑排序键）的估算占用，见 tools/bench_index.py
+    ORDERING_KEY_BYTES = 80  # 有序索引中每个键元组的估算占用
+    SERIES_BYTES = 200  # 每个系列聚合的估算占用
+
     def __init__(self, _path: Path, ero: int = 0):
         self.comic_path = Path(_path)
         self.ero = ero
-        self.executor = ThreadPoolExecutor(max_workers=32)
+        # 扫描与同步任务统一走共享调度器的后台优先级，不再为每个库单独开线程池
+        self.executor = scheduler.executor(Priority.BACKGROUND)
 
         # 使用 StorageBackend 替代直接的 SQLite 和 ModeStrategy
         # 扫描能力统一通过 backend 访问，不再暴露 scan_strategy
         self.backend = StorageBackendFactory.create(self.comic_path, ero)
+        # 成员索引按库落库到 rV.db：随实例登记，close 时注销（backend 由工厂复用，不能只在其构造时登记一次）
+        get_cbz_index().register(self.backend.comic_path, self.backend)
         self.scan_path = self.backend.scan_path
-
-        self.books_index = {}  # {(book, ep): BookData}
+        # 扫描时顺带采集完整页面列表（遍历目录/读取 namelist 时已拿到），写入 pages 表供冷启动的 get_pages 使用
+        self.scan_engine = ScanEngine(functools.partial(self.backend.scan_series, return_all=True),
+                                      self.scan_path, self.executor)
+
+        self.books_index = BooksIndex()  # {(book, ep): BookData}
+        # 系列级有序索引随 series_index 同步维护，供 cursor 分页使用：按系列翻页，系列不会被页边界拆开
+        self.orderings = {
+            'time': SortedIndex(lambda s: (s.latest_mtime, s.book)),
+            'name': SortedIndex(lambda s: (s.book,)),
+            # 仅在全部条目都带 话/卷 编号时用于名称排序，见 section_covered；按封面章节（编号最小者）的章节键排序
+            'section': SortedIndex(lambda s: (*(s.cover.section_key or (s.book, 2, 0)), s.book)),
+        }
+        self._unsectioned = 0  # 不带 话/卷 编号的条目数，随增删增量维护
+        # 系列聚合随 books_index 增量维护，加载时由条目重建，不单独落库
+        self.series_index = SeriesIndex()  # {book: SeriesAggregate}
         self._index_lock = threading.RLock()  # 保护 books_index 的线程安全
+        # 单调递增的索引版本号，任何增删改都会 +1；generation 区分进程/实例，避免重启后版本号碰撞
+        self.version = 0
+        self._generation = f"{time.time_ns():x}"
+        self.progress = ScanProgress()
+        self._scan_cancel = threading.Event()
+
+    @property
+    def etag(self) -> str:
+        return f'W/"{self._generation}-{int(self.ero)}-{self.version}"'
+
+    def _put_book(self, book_data: BookData):
+        """写入 books_index 并更新有序索引，调用方需持有 _index_lock"""
+        if old := self.books_index.get((book_data.book, book_data.ep)):
+            self._unsectioned -= not old.has_section
+        self.books_index.put(book_data)
+        self._unsectioned += not book_data.has_section
+        self._index_series((old,) if old else (), (book_data,))
+        self.version += 1
+
+    def _pop_book(self, key: tuple):
+        """从 books_index 移除并更新有序索引，调用方需持有 _index_lock"""
+        if (old := self.books_index.pop(key, None)) is not None:
+            self._unsectioned -= not old.has_section
+            self._index_series((old,), ())
+            self.version += 1
+        return old
+
+    def _rebuild_orderings(self):
+        """批量加载后一次性重建有序索引，调用方需持有 _index_lock"""
+        self.series_index.rebuild(self.books_index.values())
+        for ordering in self.orderings.values():
+            ordering.rebuild(self.series_index.values())
+        self._unsectioned = sum(not b.has_section for b in self.books_index.values())
+        self.version += 1
+
+    def _index_series(self, removed, added):
+        """更新受影响系列的聚合与系列有序索引，调用方需持有 _index_lock
+
+        有序索引的键取自聚合值，须在聚合变化前按旧键移除、重算后再插入
+        """
+        touched = {b.book for b in removed} | {b.book for b in added}
+        for book in touched:
+            if (series := self.series_index.get(book)) is not None:
+                for ordering in self.orderings.values():
+                    ordering.discard(series)
+        for book_data in removed:
+            self.series_index.discard(book_data)
+        for book_data in added:
+            self.series_index.add(book_data)
+        refreshed = []
+        for book in touched:
+            if (series := self.series_index.get(book)) is not None:
+                series.refresh()
+                refreshed.append(series)
+        for ordering in self.orderings.values():
+            if len(refreshed) == 1:
+                ordering.add(refreshed[0])
+            elif refreshed:
+                ordering.add_many(refreshed)
+
+    def series_summaries(self, func: str, reverse: bool) -> list:
+        """系列聚合列表；time 按系列内最新 mtime 排序，其余按书名排序"""
+        key = (lambda s: s.latest_mtime) if func == 'time' else (lambda s: s.book)
+        with self._index_lock:
+            return sorted(self.series_index.values(), key=key, reverse=reverse)
+
+    def series_episodes(self, book: str) -> Optional[list]:
+        """系列下按编号排序的章节，系列不存在时返回 None"""
+        with self._index_lock:
+            if (series := self.series_index.get(book)) is None:
+                return None
+            return series.sorted_episodes()
+
+    def next_episode(self, book: str, ep: str) -> Optional[str]:
+        """系列内排在 ep 之后的章节（与 BooksAggregator 相同的自然顺序），没有时返回 None"""
+        eps = self.series_episodes(book) or []
+        for i, book_data in enumerate(eps[:-1]):
+            if book_data.ep == ep:
+                return eps[i + 1].ep
+        return None
+
+    def section_covered(self) -> bool:
+        """是否全部条目都带 话/卷 编号；读取增量维护的计数，无需遍历"""
+        return bool(self.books_index) and self._unsectioned == 0
+
+    def page_books(self, func: str, reverse: bool, cursor: str = None, limit: int = 50) -> tuple:
+        """按系列有序索引分页，返回 (groups, next_cursor)：每页 limit 个完整系列，groups 为各系列的条目列表；
+
+        cursor 为上一页最后一个系列的排序键，非法时抛出 ValueError
+        """
+        cursor_key = decode_cursor(cursor) if cursor else None
+        with self._index_lock:
+            try:
+                books, next_key = self.orderings[func].page(cursor_key, limit, reverse)
+            except TypeError as e:
+                raise ValueError(f"invalid cursor: {cursor}") from e
+            groups = [list(self.series_index[book].episodes) for book in books]
+        return groups, encode_cursor(next_key) if next_key else None
+
+    def search_books(self, query: str, limit: int = 50, offset: int = 0) -> tuple:
+        """搜索书名/章节名，返回 (books, has_more)；后端不支持全文索引时在内存索引中过滤"""
+        keys = self.backend.search_books(query, limit + 1, offset)
+        if keys is None:
+            terms = [t.casefold() for t in query.split()]
+            with self._index_lock:
+                matched = [b for b in self.books_index.values()
+                           if all(t in b.name.casefold() for t in terms)]
+            # 书名命中优先，其次书名前缀命中，再按名称排序
+            matched.sort(key=lambda b: (not all(t in b.book.casefold() for t in terms),
+                                        not b.book.casefold().startswith(terms[0]) if terms else True, b.name))
+            books = matched[offset:offset + limit + 1]
+        else:
+            with self._index_lock:
+                books = [b for k in keys if (b := self.books_index.get(tuple(k)))]
+        return books[:limit], len(books) > limit
 
     def load_from_db(self):
         with self._index_lock:
             self.books_index = self.backend.load_books_from_cache()
+            self._rebuild_orderings()
         logger.debug(f"Loaded {len(self.books_index)} books from cache (ero={self.ero})")
 
     def is_scanned(self) -> bool:
         return self.backend.is_cache_available()
 
+    def cache_state(self) -> str:
+        """complete / partial / empty，见 StorageBackend.get_cache_state"""
+        return self.backend.get_cache_state()
+
     def initial_scan(self):
-        logger.debug(f"Performing initial scan using backend: {self.backend.__class__.__name__}")
-        all_book_paths = self.backend.collect_book_paths(self.scan_path)
-        if not all_book_paths:
-            logger.debug("No books found.")
-            return
+        """流式全量扫描：结果按块写入 rV.db 并即时发布到 books_index，内存占用与库大小无关
 
-        books_data_for_db = []
-        results = self.executor.map(
-            lambda path: self.backend.scan_book(path, self.scan_path),
-            all_book_paths
+        上次扫描中断（进程被杀、切换库时取消）时，跳过断点中已完成的系列继续扫描
+        """
+        logger.debug(f"Performing initial scan using backend: {self.backend.__class__.__name__}")
+        self._scan_cancel.clear()
+        generation, completed = self.backend.begin_scan()
+        progress = self.progress = ScanProgress(kind="resume" if completed else "initial", running=True, started_at=time.time())
+        # 先记录顶层系列 mtime，扫描期间发生的变更会在下次同步时被识别
+        series_mtimes = self.backend.collect_series(self.scan_path)
+        if series_mtimes is None:
+            all_book_paths = self.backend.collect_book_paths(self.scan_path)
+            progress.series_total = len(all_book_paths)
+            results = ((None, [entry] if entry else []) for entry in self.executor.map(self._scan_book_entry, all_book_paths))
+        else:
+            progress.series_total = len(series_mtimes)
+            pending_series = [s for s in series_mtimes if s not in completed]
+            progress.series_done = len(series_mtimes) - len(pending_series)
+            if completed:
+                logger.info(f"Resuming interrupted scan: {len(pending_series)} of {len(series_mtimes)} series left")
+            results = self.scan_engine.iter_scan(pending_series)
+
+        chunk, chunk_series, chunk_pages = [], [], []
+        finished = False
+        try:
+            for series, rows in results:
+                if self._scan_cancel.is_set():
+                    logger.debug("Initial scan cancelled.")
+                    break
+                rows, pages_data = self._split_pages(rows)
+                chunk.extend(rows)
+                chunk_pages.extend(pages_data)
+                if series is not None:
+                    chunk_series.append((series, series_mtimes[series]))
+                progress.series_done += 1
+                progress.books_scanned += len(rows)
+                if len(chunk) >= self.SCAN_CHUNK_SIZE:
+                    self._commit_scan_chunk(chunk, chunk_series, generation, chunk_pages)
+                    chunk, chunk_series, chunk_pages = [], [], []
+            else:
+                self._commit_scan_chunk(chunk, chunk_series, generation, chunk_pages)
+                finished = True
+        finally:
+            results.close()
+            if finished:
+                self.backend.finish_scan(generation)
+            progress.running = False
+            progress.finished_at = time.time()
+        if finished and completed:
+            # 续扫只覆盖未完成的系列，中断期间被删除或修改的已完成系列交给增量同步处理
+            self.sync_changed_series()
+        logger.debug(f"Initial scan {'complete' if finished else 'interrupted'}: "
+                     f"{progress.books_scanned} books in {progress.series_done} series.")
+
+    @staticmethod
+    def _split_pages(rows: list) -> tuple:
+        """将 scan_series(return_all=True) 的结果拆分为条目行 (book, ep, mtime, first_img) 与页面行"""
+        entries, pages_data = [], []
+        for book, ep, mtime, pages in rows:
+            if isinstance(pages, list):
+                pages_data.append((book, ep, mtime, pages))
+                pages = pages[0]
+            entries.append((book, ep, mtime, pages))
+        return entries, pages_data
+
+    def _commit_scan_chunk(self, rows: list, series_mtimes: list, generation: Optional[str] = None,
+                           pages_data: list = None):
+        """提交一块扫描结果：写库、记录系列 mtime、断点与页面列表，然后发布到内存索引"""
+        self.backend.save_scan_chunk(
+            [(book, ep, mtime, first_img, self.ero) for book, ep, mtime, first_img in rows], series_mtimes, generation,
+            pages_data
         )
+        if not rows:
+            return
+        with self._index_lock:
+            added, replaced = [], []
+            for book, ep, mtime, first_img in rows:
+                if old := self.books_index.get((book, ep)):
+                    replaced.append(old)
+                    self._unsectioned -= not old.has_section
+                added.append(self.books_index.put(BookData(book, ep, mtime, first_img, self.ero, self.backend)))
+                self._unsectioned += not added[-1].has_section
+            self._index_series(replaced, added)
+            self.version += 1
+        logger.debug(f"Committed {len(rows)} books into cache")
+
+    def cancel_scan(self):
+        self._scan_cancel.set()
+
+    def estimate_memory(self) -> int:
+        """估算内存占用（字节）：条目本身 + 系列聚合及其在各有序索引中的键"""
+        return (len(self.books_index) * self.ENTRY_BYTES
+                + len(self.series_index) * (self.SERIES_BYTES + self.ORDERING_KEY_BYTES * len(self.orderings)))
+
+    def close(self):
+        """释放内存索引；之后可通过新实例从 rV.db 重新加载"""
+        self.cancel_scan()
+        with self._index_lock:
+            self.books_index.clear()
+            for ordering in self.orderings.values():
+                ordering.clear()
+            self.series_index.clear()
+            self._unsectioned = 0
+            self.version += 1
+        # 注销成员索引的落库登记，被淘汰的库不再被全局索引引用
+        get_cbz_index().unregister(self.backend.comic_path, self.backend)
+        logger.debug(f"Closed library cache: {self.scan_path} (ero={self.ero})")
+
+    def _scan_book_entry(self, path: Path) -> Optional[tuple]:
+        """扫描单个书籍路径，返回 (book, ep, mtime, first_img)"""
+        if result := self.backend.scan_book(path, self.scan_path):
+            _, parent_name, chapter_name, mtime, first_img = result
+            ep = "" if chapter_name == parent_name else chapter_name
+            return parent_name, ep, mtime, first_img
+        return None
+
+    def sync_changed_series(self) -> Optional[dict]:
+        """增量同步：对比顶层系列 mtime 与 dir_mtime_cache，仅重扫发生变化的系列
+
+        返回 {"added", "removed", "updated", "series"} 统计；后端不支持时返回 None
+        """
+        series_mtimes = self.backend.collect_series(self.scan_path)
+        if series_mtimes is None:
+            return None
+        cached_mtimes = self.backend.load_all_dir_mtimes()
+
+        # 按系列分组的内存条目集合，与 rV.db 中 exist=1 的条目一致
+        entries_by_series = {}
+        with self._index_lock:
+            for key in self.books_index:
+                entries_by_series.setdefault(key[0], set()).add(key)
+
+        changed = [s for s, mtime in series_mtimes.items() if cached_mtimes.get(s) != mtime]
+        vanished = (set(cached_mtimes) | set(entries_by_series)) - set(series_mtimes)
+        stats = {"added": 0, "removed": 0, "updated": 0, "series": len(changed) + len(vanished)}
+
+        for series in vanished:
+            for book, ep in entries_by_series.get(series, ()):
+                self.remove_book(book, ep)
+                stats["removed"] += 1
+
+        rows, changed_pages = [], []
+        for series, scanned in self.scan_engine.iter_scan(changed):
+            self._diff_series(scanned, entries_by_series.get(series, set()), stats, rows, changed_pages)
+        self._save_scanned_rows(rows, changed_pages)
+        self.backend.update_dir_mtime_cache_batch([(s, series_mtimes[s]) for s in changed])
+        self.backend.remove_dir_mtime_cache([s for s in vanished if s in cached_mtimes])
+        return stats
+
+    def _diff_series(self, scanned: list, known: set, stats: dict, rows: list, changed_pages: list):
+        """比对单个系列的扫描结果与已知条目：变化的行追加到 rows / changed_pages，消失的条目直接移除"""
+        fs_keys = set()
+        for book, ep, mtime, pages in scanned:
+            first_img = pages[0] if isinstance(pages, list) else pages
+            fs_keys.add((book, ep))
+            with self._index_lock:
+                old = self.books_index.get((book, ep))
+            if old is None or old.mtime != mtime or old.first_img != first_img:
+                rows.append((book, ep, mtime, first_img, self.ero))
+                if isinstance(pages, list):
+                    changed_pages.append((book, ep, mtime, pages))
+                stats["added" if old is None else "updated"] += 1
+        for book, ep in known - fs_keys:
+            self.remove_book(book, ep)
+            stats["removed"] += 1
+
+    def _save_scanned_rows(self, rows: list, changed_pages: list):
+        if rows:
+            self.backend.save_books_batch(rows)
+            self.backend.save_pages_batch(changed_pages)
+            with self._index_lock:
+                for book, ep, mtime, first_img, _ in rows:
+                    self._put_book(BookData(book, ep, mtime, first_img, self.ero, self.backend))
+
+    def refresh_series(self, series: str) -> dict:
+        """重扫单个系列并与内存索引比对（文件监控的系列级事件使用），系列目录已不存在时移除其全部条目
+
+        dir_mtime_cache 不在此更新，下次增量同步会再核对一次该系列
+        """
+        try:
+            scanned = self.backend.scan_series(str(self.scan_path), series, return_all=True)
+        except OSError:
+            scanned = []
+        with self._index_lock:
+            aggregate = self.series_index.get(series)
+            known = {(series, b.ep) for b in aggregate.episodes} if aggregate else set()
+        stats = {"added": 0, "removed": 0, "updated": 0}
+        rows, changed_pages = [], []
+        self._diff_series(scanned, known, stats, rows, changed_pages)
+        self._save_scanned_rows(rows, changed_pages)
+        return stats
+
+    def apply_pages(self, book: str, ep: str, mtime: float, pages) -> None:
+        """页面列表已在内存中增量更新时直接更新索引并落库，不重新扫描"""
+        if not pages:
+            self.remove_book(book, ep)
+            return
+        self._save_scanned_rows([(book, ep, mtime, next(iter(pages)), self.ero)], [(book, ep, mtime, pages.to_list())])
 
-        for result in results:
-            if result:
-                _, parent_name, chapter_name, mtime, first_img = result
-                book = parent_name
-                ep = "" if chapter_name == parent_name else chapter_name
-                books_data_for_db.append((book, ep, mtime, first_img, self.ero))
-                with self._index_lock:
-                    self.books_index[(book, ep)] = BookData(book, ep, mtime, first_img, self.ero, self.backend)
-
-        if books_data_for_db:
-            self.backend.save_books_batch(books_data_for_db)
-            logger.debug(f"Batch inserted {len(books_data_for_db)} books into cache")
+    def rename_entries(self, old_book: str, new_book: str, old_ep: Optional[str] = None, new_ep: Optional[str] = None) -> int:
+        """原地重命名条目，不重新扫描：old_ep 为 None 时重命名整个系列，否则只重命名单个章节
 
-        logger.debug("Initial scan complete.")
+        返回重命名的条目数；后端不支持时返回 -1，由调用方回退到重扫
+        """
+        with self._index_lock:
+            aggregate = self.series_index.get(old_book)
+            olds = [b for b in (aggregate.episodes if aggregate else ()) if old_ep is None or b.ep == old_ep]
+        if not olds:
+            return 0
+        if not self.backend.rename_books(old_book, new_book, old_ep, new_ep):
+            return -1
+        with self._index_lock:
+            for old in olds:
+                self._pop_book((old.book, old.ep))
+                ep = old.ep if old_ep is None else new_ep
+                self._put_book(BookData(new_book, ep, old.mtime, old.first_img, self.ero, self.backend))
+        logger.debug(f"Renamed {len(olds)} entries: {old_book}/{old_ep or '*'} -> {new_book}/{new_ep or '*'}")
+        return len(olds)
 
     def _scan_fs_entries(self) -> set:
         """扫描文件系统条目"""
@@ -80,38 +440,42 @@ class ComicCacheManager:
         return entries
 
     async def update_book_async(self, book: str, ep: str):
-        loop = asyncio.get_running_loop()
-        await loop.run_in_executor(self.executor, self.update_book_sync, book, ep)
+        await scheduler.run(Priority.BACKGROUND, self.update_book_sync, book, ep)
 
     def update_book_sync(self, book: str, ep: str):
         book_path = self.backend.build_book_path(book, ep)
-        scan_result = self.backend.scan_book(book_path, self.scan_path)
+        scan_result = self.backend.scan_book(book_path, self.scan_path, return_all=True)
         if not scan_result:
-            logger.debug(f"Skipping update for non-existent path: {book}/{ep}")
+            with self._index_lock:
+                known = (book, ep) in self.books_index
+            if known:
+                # 书籍目录已删除或其中图片已被清空
+                self.remove_book(book, ep)
+            else:
+                logger.debug(f"Skipping update for non-existent path: {book}/{ep}")
             return
 
-        _, _, _, mtime, first_img = scan_result
+        _, _, _, mtime, pages = scan_result
+        first_img = pages[0]
         self.backend.save_book_to_cache(book, ep, mtime, first_img)
+        self.backend.save_pages_batch([(book, ep, mtime, pages)])
         with self._index_lock:
-            self.books_index[(book, ep)] = BookData(book, ep, mtime, first_img, self.ero, self.backend)
+            self._put_book(BookData(book, ep, mtime, first_img, self.ero, self.backend))
         logger.debug(f"Updated cache for: {book}/{ep}")
 
     async def remove_book_async(self, book: str, ep: str):
-        loop = asyncio.get_running_loop()
-        await loop.run_in_executor(self.executor, self.remove_book, book, ep)
+        await scheduler.run(Priority.BACKGROUND, self.remove_book, book, ep)
 
     def remove_book(self, book: str, ep: str):
         self.backend.remove_book_from_cache(book, ep)
         with self._index_lock:
-            if (book, ep) in self.books_index:
-                del self.books_index[(book, ep)]
+            if self._pop_book((book, ep)) is not None:
                 logger.debug(f"Removed from cache: {book}/{ep}")  # must be set only after del, to reduce debug-log!
 
     def set_handle(self, book: str, ep: str, handle: str):
         self.backend.set_book_handle(book, ep, handle)
         with self._index_lock:
-            if (book, ep) in self.books_index:
-                del self.books_index[(book, ep)]
+            if self._pop_book((book, ep)) is not None:
                 logger.debug(f"Set handle '{handle}' for: {book}/{ep}")  # must be set only after del, to reduce debug-log!
 
     def reset_exist_flags(self):
@@ -119,88 +483,183 @@ class ComicCacheManager:
         self.backend.reset_cache()
         with self._index_lock:
             self.books_index.clear()
+            for ordering in self.orderings.values():
+                ordering.clear()
+            self.series_index.clear()
+            self._unsectioned = 0
+            self.version += 1
         logger.info(f"Reset exist flags for ero={self.ero}")
 
 
 class ComicLibraryManager:
     def __init__(self):
-        self.cache_instances = {}
-        self.pages_handlers = {}
+        # 按最近使用排序，超出 library_cache 限制时淘汰最久未用的库
+        self.cache_instances: "OrderedDict[str, ComicCacheManager]" = OrderedDict()
+        self.pages_handlers: "dict[str, BookPagesHandler]" = {}
         self.active_path = None
         self.active_cache: ComicCacheManager = None
         self.active_pages_handler = None
-        self.observer = None
+        self.watcher: Optional[LibraryWatcher] = None
         self.ero = False
         self._background_sync_task = None  # 后台同步任务
+        self._scan_tasks = set()  # 后台首次扫描任务，持有引用防止被回收
 
     @property
     def bind_path(self):
         return self.active_path if not self.ero else self.active_path.joinpath(f"_{Var.doujinshi}")
 
+    @staticmethod
+    def _cache_key(comic_path: Path, ero) -> str:
+        return f"{comic_path}|ero={int(bool(ero))}"
+
     async def switch_library(self, new_comic_path, main_loop=None, ero: bool = None):
+        """切换到指定路径的库；同一路径下 ero 与非 ero 两个库同时常驻、共用一个监控与后台同步
+
+        只切换 ero 时仅改活动指针，毫秒级返回
+        """
         new_ero = ero if ero is not None else self.ero
         new_comic_path = Path(new_comic_path)
-        cache_key = f"{new_comic_path}|ero={new_ero}"
-
-        old_key = f"{self.active_path}|ero={self.ero}" if self.active_path else None
-        if cache_key == old_key and self.active_cache:
+        cache_key = self._cache_key(new_comic_path, new_ero)
+
+        if self.active_cache and new_comic_path == self.active_path and cache_key in self.cache_instances:
+            if ero is not None:
+                self.ero = ero
+            if self.active_cache is not self.cache_instances[cache_key]:
+                self.active_pages_handler.cancel_prefetch()
+                self._activate(cache_key)
+            if main_loop and self.watcher is None and self.active_cache.backend.supports_file_watching():
+                self._start_watching(main_loop)
             return
 
         if ero is not None:
             self.ero = ero
 
-        if self.observer and self.observer.is_alive():
-            self.observer.stop()
-            self.observer.join()
+        self.stop_watching()
 
-        # 取消正在进行的后台同步任务
+        # 取消正在进行的后台同步任务（首次扫描不受影响，继续在后台完成）
         if self._background_sync_task and not self._background_sync_task.done():
             self._background_sync_task.cancel()
             with contextlib.suppress(asyncio.CancelledError):
                 await self._background_sync_task
 
         self.active_path = new_comic_path
+        if self.active_pages_handler:
+            self.active_pages_handler.cancel_prefetch()
 
-        if cache_key in self.cache_instances:
-            self.active_cache = self.cache_instances[cache_key]
-            self.active_pages_handler = self.pages_handlers[cache_key]
-        else:
-            cache_manager = ComicCacheManager(self.active_path, self.ero)
-            pages_handler = BookPagesHandler(cache_manager.scan_path, self.ero)
-
-            if not cache_manager.is_scanned():
-                await asyncio.to_thread(cache_manager.initial_scan)
-            else:
-                # 立即从缓存加载，不阻塞
-                cache_manager.load_from_db()
-                # 启动后台同步任务
-                self._background_sync_task = asyncio.create_task(
-                    self._background_sync(cache_manager)
-                )
-
-            self.cache_instances[cache_key] = cache_manager
-            self.pages_handlers[cache_key] = pages_handler
-            self.active_cache = cache_manager
-            self.active_pages_handler = pages_handler
+        to_sync = [c for c in (self._open_library(new_comic_path, e) for e in (0, 1)) if c]
+        self._activate(cache_key)
+        self._evict_libraries()
+        if to_sync:
+            # 两个库的增量同步在同一个后台任务中依次进行
+            self._background_sync_task = asyncio.create_task(self._background_sync(*to_sync))
 
         if main_loop and self.active_cache.backend.supports_file_watching():
             scan_path = self.active_cache.scan_path
             if scan_path.exists():
-                event_handler = ComicChangeHandler(self.active_cache, self.active_pages_handler, main_loop)
-                self.observer = Observer()
-                self.observer.schedule(event_handler, str(scan_path), recursive=True)
-                self.observer.start()
+                self._start_watching(main_loop)
                 logger.debug(f"Now monitoring: {scan_path} (ero={self.ero})")
             else:
                 logger.debug(f"Skip monitoring: {scan_path} does not exist (ero={self.ero})")
 
-    async def _background_sync(self, cache_manager: ComicCacheManager):
-        """后台增量同步，不阻塞用户操作"""
+    def _open_library(self, comic_path: Path, ero: int) -> Optional[ComicCacheManager]:
+        """载入（或复用）单个库；从 rV.db 载入、需要后台增量同步时返回该库"""
+        cache_key = self._cache_key(comic_path, ero)
+        if cache_key in self.cache_instances:
+            self.cache_instances.move_to_end(cache_key)
+            return None
+        cache_manager = ComicCacheManager(comic_path, ero)
+        page_cache_mb = backend.config.library_cache.get('page_cache_mb')
+        pages_handler = BookPagesHandler(cache_manager.scan_path, ero,
+                                         max_bytes=page_cache_mb * 1024 * 1024 if page_cache_mb else None,
+                                         next_episode=cache_manager.next_episode)
+        self.cache_instances[cache_key] = cache_manager
+        self.pages_handlers[cache_key] = pages_handler
+
+        cache_state = cache_manager.cache_state()
+        if cache_state != 'complete':
+            if cache_state == 'partial':
+                # 上次扫描中断：先展示已落库的部分，再从断点续扫
+                cache_manager.load_from_db()
+            # 首次扫描在后台进行，书籍按块逐步可见，不阻塞启动
+            task = asyncio.create_task(self._background_initial_scan(cache_manager))
+            self._scan_tasks.add(task)
+            task.add_done_callback(self._scan_tasks.discard)
+            return None
+        # 立即从缓存加载，不阻塞
+        cache_manager.load_from_db()
+        return cache_manager
+
+    def _activate(self, cache_key: str):
+        self.cache_instances.move_to_end(cache_key)
+        self.active_cache = self.cache_instances[cache_key]
+        self.active_pages_handler = self.pages_handlers[cache_key]
+
+    def _start_watching(self, main_loop):
+        libraries = [(self.cache_instances[key], self.pages_handlers[key])
+                     for key in (self._cache_key(self.active_path, e) for e in (0, 1)) if key in self.cache_instances]
+        self.watcher = LibraryWatcher(libraries, main_loop)
+        self.watcher.start()
+
+    def stop_watching(self):
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+
+    def _evict_libraries(self):
+        """按数量和估算内存淘汰不活跃的库，活跃库和正在首次扫描的库不会被淘汰"""
+        limits = backend.config.library_cache
+        max_instances = limits.get('max_instances', 4)
+        max_bytes = limits.get('max_memory_mb', 512) * 1024 * 1024
+
+        def usage():
+            return sum(c.estimate_memory() + self.pages_handlers[k].estimate_memory()
+                       for k, c in self.cache_instances.items())
+
+        for key in list(self.cache_instances):
+            if len(self.cache_instances) <= max_instances and usage() <= max_bytes:
+                break
+            cache_manager = self.cache_instances[key]
+            if cache_manager.comic_path == self.active_path or cache_manager.progress.running:
+                continue
+            del self.cache_instances[key]
+            self.pages_handlers.pop(key).clear_cache()
+            cache_manager.close()
+            logger.info(f"Evicted inactive library: {key}")
+
+    async def _background_initial_scan(self, cache_manager: ComicCacheManager):
+        try:
+            await scheduler.run(Priority.ORCHESTRATION, cache_manager.initial_scan)
+            if (self.watcher and self.watcher.needs_replan and cache_manager in self.watcher.caches
+                    and not any(c.progress.running for c in self.watcher.caches)):
+                # 扫描期间只能保守监控，完成后按实际目录数重新分配原生监控预算
+                main_loop = self.watcher.loop
+                self.stop_watching()
+                self._start_watching(main_loop)
+        except asyncio.CancelledError:
+            cache_manager.cancel_scan()
+            raise
+        except Exception as e:
+            logger.error(f"Initial scan error: {e}")
+
+    async def _background_sync(self, *cache_managers: ComicCacheManager):
+        """后台增量同步，不阻塞用户操作；同一路径下的多个库依次同步"""
+        try:
+            for cache_manager in cache_managers:
+                await self._sync_library(cache_manager)
+        except asyncio.CancelledError:
+            logger.debug("Background sync cancelled.")
+            raise
+
+    async def _sync_library(self, cache_manager: ComicCacheManager):
         try:
             logger.debug(f"Starting background sync for ero={cache_manager.ero}")
+            if (stats := await scheduler.run(Priority.ORCHESTRATION, cache_manager.sync_changed_series)) is not None:
+                logger.info(f"Background sync complete (ero={cache_manager.ero}): {stats}")
+                return
+            # 后端不支持系列 mtime 时回退到全量比对
             with cache_manager._index_lock:
                 db_entries = set(cache_manager.books_index.keys())
-            fs_entries = await asyncio.to_thread(cache_manager._scan_fs_entries)
+            fs_entries = await scheduler.run(Priority.BACKGROUND, cache_manager._scan_fs_entries)
 
             deleted = db_entries - fs_entries
             added = fs_entries - db_entries
@@ -213,14 +672,13 @@ class ComicLibraryManager:
             if added:
                 logger.info(f"Background sync: Found {len(added)} books added offline. Adding to cache...")
                 tasks = [
-                    asyncio.to_thread(cache_manager.update_book_sync, book, ep)
+                    scheduler.run(Priority.BACKGROUND, cache_manager.update_book_sync, book, ep)
                     for book, ep in added
                 ]
                 await asyncio.gather(*tasks)
 
             logger.debug("Background sync complete.")
         except asyncio.CancelledError:
-            logger.debug("Background sync cancelled.")
             raise
         except Exception as e:
             logger.error(f"Background sync error: {e}")
@@ -229,7 +687,7 @@ class ComicLibraryManager:
         """同步启动扫描（保留以支持旧代码路径）"""
         with cache_manager._index_lock:
             db_entries = set(cache_manager.books_index.keys())
-        fs_entries = await asyncio.to_thread(cache_manager._scan_fs_entries)
+        fs_entries = await scheduler.run(Priority.BACKGROUND, cache_manager._scan_fs_entries)
 
         deleted = db_entries - fs_entries
         added = fs_entries - db_entries
@@ -242,23 +700,22 @@ class ComicLibraryManager:
         if added:
             logger.info(f"Found {len(added)} books added offline. Adding to cache...")
             tasks = [
-                asyncio.to_thread(cache_manager.update_book_sync, book, ep)
+                scheduler.run(Priority.BACKGROUND, cache_manager.update_book_sync, book, ep)
                 for book, ep in added
             ]
             await asyncio.gather(*tasks)
 
         logger.debug("Startup synchronization complete.")
 
-    async def force_rescan(self, main_loop=None):
-        """强制重新扫描：释放资源，重置数据库，重新扫描"""
+    async def force_rescan(self, main_loop=None, full: bool = False):
+        """强制重新扫描：释放资源后仅重扫 mtime 变化的系列；full=True 时重置数据库并全量扫描"""
         if not self.active_cache:
             return {"error": "No active library"}
+        if self.active_cache.progress.running:
+            return {"error": "Scan in progress"}
 
         # 1. 停止文件监控
-        if self.observer and self.observer.is_alive():
-            self.observer.stop()
-            self.observer.join()
-            self.observer = None
+        self.stop_watching()
 
         # 2. 关闭 CBZ 缓存
         close_cbz_cache()
@@ -267,18 +724,17 @@ class ComicLibraryManager:
         if self.active_pages_handler:
             self.active_pages_handler.clear_cache()
 
-        # 4. 重置数据库 exist 字段并清空内存缓存
-        self.active_cache.reset_exist_flags()
-
-        # 5. 重新扫描
-        await asyncio.to_thread(self.active_cache.initial_scan)
+        # 4. 增量重扫；不支持增量或指定 full 时，重置数据库 exist 字段并全量扫描
+        stats = None if full else await scheduler.run(Priority.ORCHESTRATION, self.active_cache.sync_changed_series)
+        if stats is None:
+            self.active_cache.reset_exist_flags()
+            await scheduler.run(Priority.ORCHESTRATION, self.active_cache.initial_scan)
+        else:
+            logger.info(f"Incremental rescan: {stats}")
 
-        # 6. 重启文件监控
+        # 5. 重启文件监控
         if main_loop and self.active_cache.backend.supports_file_watching():
-            event_handler = ComicChangeHandler(self.active_cache, self.active_pages_handler, main_loop)
-            self.observer = Observer()
-            self.observer.schedule(event_handler, str(self.active_cache.scan_path), recursive=True)
-            self.observer.start()
+            self._start_watching(main_loop)
             logger.info(f"Restarted monitoring: {self.active_cache.scan_path}")
 
         book_count = len(self.active_cache.books_index)
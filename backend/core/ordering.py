@@ -0,0 +1,73 @@
+import json
+import base64
+from bisect import bisect_left, bisect_right, insort
+from typing import Callable, Iterable, List, Optional, Tuple
+
+
+def encode_cursor(key: tuple) -> str:
+    """将排序键编码为不透明的 cursor 字符串"""
+    raw = json.dumps(list(key), ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """解码 cursor，格式非法时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"invalid cursor: {cursor}") from e
+    if not isinstance(key, list) or not key:
+        raise ValueError(f"invalid cursor: {cursor}")
+    return tuple(key)
+
+
+class SortedIndex:
+    """基于 bisect 的有序键列表
+
+    键的最后一位固定为系列名 book，用于回查 series_index；
+    增删为 O(log n) 定位 + 一次 memmove，分页为 O(log n + limit)。
+    """
+
+    def __init__(self, key_func: Callable):
+        self.key_func = key_func
+        self._keys: List[tuple] = []
+
+    def __len__(self):
+        return len(self._keys)
+
+    def rebuild(self, books: Iterable):
+        self._keys = sorted(self.key_func(b) for b in books)
+
+    def clear(self):
+        self._keys.clear()
+
+    def add(self, book_data):
+        insort(self._keys, self.key_func(book_data))
+
+    def add_many(self, books: Iterable):
+        # 已有部分是一段有序序列，timsort 只需排好新增部分再做一次归并
+        self._keys.extend(self.key_func(b) for b in books)
+        self._keys.sort()
+
+    def discard(self, book_data):
+        key = self.key_func(book_data)
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+    def page(self, cursor_key: Optional[tuple], limit: int, reverse: bool) -> Tuple[List[Tuple[str, str]], Optional[tuple]]:
+        """从 cursor 之后取一页，返回 ([book, ...], 下一页的 cursor 键)"""
+        keys = self._keys
+        if reverse:
+            end = bisect_left(keys, cursor_key) if cursor_key is not None else len(keys)
+            start = max(0, end - limit)
+            chunk = keys[start:end][::-1]
+            has_more = start > 0
+        else:
+            start = bisect_right(keys, cursor_key) if cursor_key is not None else 0
+            end = start + limit
+            chunk = keys[start:end]
+            has_more = end < len(keys)
+        next_key = chunk[-1] if chunk and has_more else None
+        return [k[-1] for k in chunk], next_key
@@ -0,0 +1,99 @@
+import re
+import sys
+from bisect import bisect_left
+from typing import Iterator, List, Sequence
+
+_NUMBERED = re.compile(r'^(.*?)(\d+)(\D*)$')
+_SEP = '\0'  # 文件名中不会出现 NUL，用作打包分隔符
+
+
+class PageList:
+    """紧凑存储的页面列表，可迭代、可取长度，与 list[str] 用法一致
+
+    两种编码：
+    - 连续编号（"001.jpg" ... "120.jpg"）：只存前缀、起始编号、页数、位宽与后缀
+    - 其他：所有页面名以 NUL 拼接为单个字符串，迭代时再拆分
+
+    单个 str 的对象头约 50 字节，数千页的条漫逐个存储时对象头就占去大半内存。
+    """
+    __slots__ = ('_prefix', '_start', '_count', '_width', '_suffix', '_packed')
+
+    def __init__(self, pages: Sequence[str]):
+        self._packed = None
+        self._prefix = self._suffix = ''
+        self._start = self._width = 0
+        self._count = len(pages)
+        if not self._encode_range(pages):
+            self._packed = _SEP.join(pages)
+
+    def _encode_range(self, pages: Sequence[str]) -> bool:
+        if not pages or not (m := _NUMBERED.match(pages[0])):
+            return False
+        prefix, digits, suffix = m.groups()
+        start, width = int(digits), len(digits)
+        # 逐个比对重建的名字，保证解码结果与原列表完全一致
+        for i, page in enumerate(pages):
+            if page != f"{prefix}{start + i:0{width}d}{suffix}":
+                return False
+        self._prefix, self._start, self._width, self._suffix = prefix, start, width, suffix
+        return True
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        if self._packed is not None:
+            return iter(self._packed.split(_SEP) if self._count else ())
+        prefix, width, suffix = self._prefix, self._width, self._suffix
+        return (f"{prefix}{n:0{width}d}{suffix}" for n in range(self._start, self._start + self._count))
+
+    def __bool__(self) -> bool:
+        return self._count > 0
+
+    def to_list(self) -> List[str]:
+        return list(self)
+
+    def _range_name(self, offset: int) -> str:
+        return f"{self._prefix}{self._start + offset:0{self._width}d}{self._suffix}"
+
+    def _with_range(self, start: int, count: int) -> 'PageList':
+        new = object.__new__(PageList)
+        new._prefix, new._width, new._suffix, new._packed = self._prefix, self._width, self._suffix, None
+        new._start, new._count = start, count
+        return new
+
+    def insert(self, name: str) -> 'PageList':
+        """返回按序插入 name 后的新列表；已存在时返回自身"""
+        if self._packed is None and self._count:
+            # 下载中的章节通常按编号逐页追加：连续编号只需延长计数
+            last = self._range_name(self._count - 1)
+            if name == self._range_name(self._count) and name > last:
+                return self._with_range(self._start, self._count + 1)
+        pages = self.to_list()
+        i = bisect_left(pages, name)
+        if i < len(pages) and pages[i] == name:
+            return self
+        pages.insert(i, name)
+        return PageList(pages)
+
+    def remove(self, name: str) -> 'PageList':
+        """返回移除 name 后的新列表；不存在时返回自身"""
+        if self._packed is None and self._count:
+            if name == self._range_name(self._count - 1):
+                return self._with_range(self._start, self._count - 1)
+            if name == self._range_name(0):
+                return self._with_range(self._start + 1, self._count - 1)
+        pages = self.to_list()
+        i = bisect_left(pages, name)
+        if i == len(pages) or pages[i] != name:
+            return self
+        del pages[i]
+        return PageList(pages)
+
+    @property
+    def nbytes(self) -> int:
+        """估算占用字节数（对象本身 + 持有的字符串）"""
+        size = sys.getsizeof(self)
+        if self._packed is not None:
+            return size + sys.getsizeof(self._packed)
+        return size + sys.getsizeof(self._prefix) + sys.getsizeof(self._suffix)
@@ -1,31 +1,57 @@
 import time
 import asyncio
+import itertools
 import contextlib
 from pathlib import Path
+from itertools import islice
 from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Optional, List
+from typing import Callable, Dict, Optional, Tuple
 
-from utils import executor, md5
+from infra import backend
+from utils import md5, Priority, scheduler
+from utils.cbz_cache import get_cbz_cache
+from utils.cbz_index import get_cbz_index
 from storage import StorageBackendFactory
+from .logging import get_logger
+from .page_list import PageList
+
+logger = get_logger()
 
 
 @dataclass
 class CacheEntry:
     md5: str
-    pages: Optional[List[str]]
+    pages: Optional[PageList]
     mtime: Optional[float]
     last_access: float
     lock: asyncio.Lock
+    version: int = 0
+    nbytes: int = 0  # 已计入 BookPagesHandler._bytes 的估算占用
 
 
 class BookPagesHandler:
-    def __init__(self, comic_path, ero: int = 0, max_entries: int = 200, loop: Optional[asyncio.AbstractEventLoop] = None):
+    DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+    ENTRY_OVERHEAD = 400  # CacheEntry、锁、md5 键与 OrderedDict 槽位的估算占用
+    PREFETCH_BACKOFF_DEPTH = 4  # 预读队列积压到此深度时不再发起新的预读
+
+    def __init__(self, comic_path, ero: int = 0, max_entries: int = None, loop: Optional[asyncio.AbstractEventLoop] = None,
+                 max_bytes: int = None, next_episode: Callable[[str, str], Optional[str]] = None):
         self.comic_path = Path(comic_path)
         self.ero = ero
+        # 按估算字节数淘汰；max_entries 仅作为可选的条目数上限保留
         self.max_entries = max_entries
+        self.max_bytes = max_bytes or self.DEFAULT_MAX_BYTES
         self.loop = loop or asyncio.get_event_loop()
         self._cache: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        # 预读：next_episode(book, ep) 返回系列内的下一章；每个系列只保留一个进行中的预读
+        self.next_episode = next_episode
+        self._prefetch_tasks: Dict[str, Tuple[str, asyncio.Task]] = {}  # {book: (ep, task)}
+        self._prefetch_stats = {'scheduled': 0, 'skipped': 0, 'cancelled': 0}
+        # 每次重新加载页面列表都分配新的版本号，淘汰后重载也不会复用旧版本
+        self._versions = itertools.count(1)
+        self._generation = f"{time.time_ns():x}"
 
         # 使用 StorageBackend
         # 注意：这里需要传入 comic_path 的父目录（如果是 ero 模式）
@@ -36,19 +62,34 @@ class BookPagesHandler:
     def _book_path(self, book: str, ep: str = None) -> Path:
         return self.backend.build_book_path(book, ep)
 
-    def _format_pages_for_api(self, book: str, ep: str, pages: list) -> dict:
-        return self.backend.format_pages_for_api(book, ep, pages)
+    def _format_pages_for_api(self, book: str, ep: str, pages: list, entry: CacheEntry = None) -> dict:
+        result = self.backend.format_pages_for_api(book, ep, pages, entry.mtime if entry is not None else None)
+        if entry is not None:
+            result["etag"] = self._etag(entry)
+        return result
+
+    def _etag(self, entry: CacheEntry) -> str:
+        return f'W/"{self._generation}-{int(self.ero)}-{entry.version}"'
+
+    def peek_etag(self, book: str, ep: str = None) -> Optional[str]:
+        """缓存有效时返回当前 ETag，不触发扫描"""
+        book_md5 = md5(f"{book}/{ep}" if ep else book)
+        if (entry := self._cache.get(book_md5)) is None or entry.pages is None:
+            return None
+        if entry.mtime != self._get_mtime(self._book_path(book, ep)):
+            return None
+        return self._etag(entry)
 
     def _get_mtime(self, book_path: Path) -> Optional[float]:
         return self.backend.get_book_mtime(book_path)
 
-    def _try_cache_hit(self, book_md5: str, current_mtime: float) -> Optional[list]:
-        """尝试缓存命中，成功返回 pages，否则返回 None"""
+    def _try_cache_hit(self, book_md5: str, current_mtime: float) -> Optional[CacheEntry]:
+        """尝试缓存命中，成功返回 entry，否则返回 None"""
         if (entry := self._cache.get(book_md5)) and entry.pages is not None and entry.mtime == current_mtime:
             entry.last_access = time.time()
             with contextlib.suppress(Exception):
                 self._cache.move_to_end(book_md5)
-            return entry.pages
+            return entry
         return None
 
     def _ensure_entry(self, book_md5: str) -> CacheEntry:
@@ -56,48 +97,65 @@ class BookPagesHandler:
         if (entry := self._cache.get(book_md5)) is None:
             entry = CacheEntry(md5=book_md5, pages=None, mtime=None, last_access=time.time(), lock=asyncio.Lock())
             self._cache[book_md5] = entry
-            if len(self._cache) > self.max_entries:
-                self._evict_one()
+            self._evict_over_budget()
         return entry
 
-    async def _scan_path(self, book_path: Path) -> Optional[tuple]:
+    async def _scan_path(self, book: str, ep: str, book_path: Path, current_mtime: Optional[float],
+                         hard_refresh: bool = False, priority: Priority = Priority.INTERACTIVE) -> Optional[tuple]:
+        """返回 (mtime, pages)；rV.db 中的页面列表与当前 mtime 一致时直接使用，否则重新扫描并回写"""
+        ep = ep or ""
+
         def _worker():
+            if not hard_refresh and current_mtime is not None:
+                with contextlib.suppress(Exception):
+                    if (stored := self.backend.load_pages(book, ep)) and stored[0] == current_mtime:
+                        return stored
             with contextlib.suppress(Exception):
                 result = self.backend.scan_book(book_path, self.backend.scan_path, return_all=True)
                 if result:
                     _, _, _, mtime, pages = result
-                    return (book_path.name, mtime, pages)
+                    with contextlib.suppress(Exception):
+                        self.backend.save_pages_batch([(book, ep, mtime, pages)])
+                    return mtime, pages
             return None
-        return await self.loop.run_in_executor(executor, _worker)
+        return await scheduler.run(priority, _worker)
 
     async def _load_with_lock(self, entry: CacheEntry, book_md5: str, book: str, ep: str, 
-                               book_path: Path, current_mtime: float, hard_refresh: bool):
+                               book_path: Path, current_mtime: float, hard_refresh: bool,
+                               priority: Priority = Priority.INTERACTIVE):
         """在锁保护下加载数据"""
         async with entry.lock:
             # double-check
             if not hard_refresh and entry.pages is not None and entry.mtime == current_mtime:
                 entry.last_access = time.time()
                 self._cache.move_to_end(book_md5)
-                return self._format_pages_for_api(book, ep, entry.pages)
+                return self._format_pages_for_api(book, ep, entry.pages, entry)
 
-            scan_result = await self._scan_path(book_path)
+            scan_result = await self._scan_path(book, ep, book_path, current_mtime, hard_refresh, priority)
             if not scan_result:
-                if book_md5 in self._cache:
-                    with contextlib.suppress(KeyError):
-                        del self._cache[book_md5]
+                self._drop(book_md5)
                 return None
 
-            _, mtime, pages_list = scan_result
-            entry.pages = pages_list
-            entry.mtime = mtime
-            entry.last_access = time.time()
-            with contextlib.suppress(Exception):
-                self._cache.move_to_end(book_md5)
+            pages = self._fill_entry(entry, book_md5, scan_result)
+            return self._format_pages_for_api(book, ep, pages, entry)
 
-            while len(self._cache) > self.max_entries:
-                self._evict_one()
+    def _fill_entry(self, entry: CacheEntry, book_md5: str, scan_result: tuple) -> PageList:
+        """把扫描结果 (mtime, pages) 写入缓存条目并按预算淘汰"""
+        mtime, pages_list = scan_result
+        pages = PageList(pages_list)
+        nbytes = pages.nbytes + self.ENTRY_OVERHEAD
+        if self._cache.get(book_md5) is entry:  # 加载期间可能已被淘汰或失效
+            self._bytes += nbytes - entry.nbytes
+        entry.nbytes = nbytes
+        entry.pages = pages
+        entry.mtime = mtime
+        entry.version = next(self._versions)
+        entry.last_access = time.time()
+        with contextlib.suppress(Exception):
+            self._cache.move_to_end(book_md5)
 
-            return self._format_pages_for_api(book, ep, pages_list)
+        self._evict_over_budget()
+        return pages
 
     async def get_pages(self, book: str, ep: str = None, hard_refresh: bool = False):
         cache_key = f"{book}/{ep}" if ep else book
@@ -108,24 +166,168 @@ class BookPagesHandler:
         # 快速路径：缓存命中
         if not hard_refresh:
             if cached := self._try_cache_hit(book_md5, current_mtime):
-                return self._format_pages_for_api(book, ep, cached)
+                self._schedule_prefetch(book, ep)
+                return self._format_pages_for_api(book, ep, cached.pages, cached)
 
         # 慢路径：需要加载
         entry = self._ensure_entry(book_md5)
-        return await self._load_with_lock(entry, book_md5, book, ep, book_path, current_mtime, hard_refresh)
+        result = await self._load_with_lock(entry, book_md5, book, ep, book_path, current_mtime, hard_refresh)
+        if result:
+            self._schedule_prefetch(book, ep)
+        return result
+
+    # ========== 预读 ==========
+
+    def _schedule_prefetch(self, book: str, ep: Optional[str]):
+        """以 PREFETCH 优先级在后台预热下一章；交互请求排队或预读积压时放弃本次预读"""
+        if not ep or self.next_episode is None or not backend.config.prefetch.get('enabled', True):
+            return
+        if (scheduler.queue_depth(Priority.INTERACTIVE)
+                or scheduler.queue_depth(Priority.PREFETCH) >= self.PREFETCH_BACKOFF_DEPTH):
+            self._prefetch_stats['skipped'] += 1
+            return
+        if not (next_ep := self.next_episode(book, ep)):
+            return
+        if current := self._prefetch_tasks.get(book):
+            if current[0] == next_ep and not current[1].done():
+                return
+            self._cancel_prefetch(book)
+        task = asyncio.create_task(self._prefetch(book, next_ep))
+        self._prefetch_tasks[book] = (next_ep, task)
+        self._prefetch_stats['scheduled'] += 1
+
+        def _done(t, book=book):
+            if (current := self._prefetch_tasks.get(book)) and current[1] is t:
+                del self._prefetch_tasks[book]
+        task.add_done_callback(_done)
+
+    async def _prefetch(self, book: str, ep: str):
+        try:
+            book_path = self._book_path(book, ep)
+            current_mtime = await scheduler.run(Priority.PREFETCH, self._get_mtime, book_path)
+            if current_mtime is None:
+                return
+            book_md5 = md5(f"{book}/{ep}")
+            if (entry := self._try_cache_hit(book_md5, current_mtime)) is None:
+                # 列表扫描在锁外以 PREFETCH 排队，不阻塞同一章节的交互请求；只在写入条目时持锁
+                if not (scan_result := await self._scan_path(book, ep, book_path, current_mtime, False,
+                                                             Priority.PREFETCH)):
+                    return
+                entry = self._ensure_entry(book_md5)
+                if entry.lock.locked():
+                    return  # 交互请求正在加载该章节，以其结果为准
+                async with entry.lock:
+                    if entry.pages is None or entry.mtime != current_mtime:
+                        self._fill_entry(entry, book_md5, scan_result)
+            if pages := entry.pages:
+                await scheduler.run(Priority.PREFETCH, self._warm_files, book_path, pages)
+            logger.debug(f"Prefetched: {book}/{ep}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"Prefetch failed for {book}/{ep}: {e}")
+
+    @staticmethod
+    def _warm_files(book_path: Path, pages):
+        """载入 CBZ 成员索引并按配置预读前几张图片，让首屏图片命中缓存/系统页缓存"""
+        images = int(backend.config.prefetch.get('images', 0) or 0)
+        if backend.config.cbz_mode:
+            cbz_cache = get_cbz_cache()
+            if get_cbz_index().get(book_path) is None:
+                return
+            for name in islice(pages, images):
+                cbz_cache.extract_image(book_path, name)
+        else:
+            for name in islice(pages, images):
+                with contextlib.suppress(OSError), open(book_path / name, 'rb') as f:
+                    while f.read(1 << 20):
+                        pass
+
+    def _cancel_prefetch(self, book: str):
+        if (current := self._prefetch_tasks.pop(book, None)) and not current[1].done():
+            current[1].cancel()
+            self._prefetch_stats['cancelled'] += 1
+
+    def cancel_prefetch(self):
+        """取消所有进行中的预读（切换/淘汰库时调用）"""
+        for book in list(self._prefetch_tasks):
+            self._cancel_prefetch(book)
+
+    # ========== 增量更新 ==========
+
+    def apply_page_change(self, book: str, ep: Optional[str], name: str, added: bool, mtime: float) -> Optional[bool]:
+        """把单张图片的增删直接应用到已缓存的页面列表（按序插入），并更新 mtime 与版本号
+
+        返回 None 表示未缓存；False 表示正在加载、无法确定结果，调用方应回退到重扫
+        """
+        book_md5 = md5(f"{book}/{ep}" if ep else book)
+        if (entry := self._cache.get(book_md5)) is None or entry.pages is None:
+            return None
+        if entry.lock.locked():
+            return False
+        pages = entry.pages.insert(name) if added else entry.pages.remove(name)
+        if not pages:
+            self._drop(book_md5)
+            return True
+        if pages is not entry.pages:
+            nbytes = pages.nbytes + self.ENTRY_OVERHEAD
+            self._bytes += nbytes - entry.nbytes
+            entry.nbytes = nbytes
+            entry.pages = pages
+            entry.version = next(self._versions)
+        entry.mtime = mtime
+        self._evict_over_budget()
+        return True
+
+    def peek_pages(self, book: str, ep: Optional[str]) -> Optional[tuple]:
+        """返回已缓存的 (mtime, pages)，不触发扫描"""
+        entry = self._cache.get(md5(f"{book}/{ep}" if ep else book))
+        if entry is None or entry.pages is None or entry.lock.locked():
+            return None
+        return entry.mtime, entry.pages
+
+    async def preload(self, book: str, ep: Optional[str], priority: Priority = Priority.BACKGROUND):
+        """以指定优先级把页面列表载入缓存（不预热图片、不触发预读）"""
+        book_md5 = md5(f"{book}/{ep}" if ep else book)
+        book_path = self._book_path(book, ep)
+        current_mtime = await scheduler.run(priority, self._get_mtime, book_path)
+        if current_mtime is None or self._try_cache_hit(book_md5, current_mtime):
+            return
+        entry = self._ensure_entry(book_md5)
+        with contextlib.suppress(Exception):
+            await self._load_with_lock(entry, book_md5, book, ep, book_path, current_mtime, False, priority)
 
     def _evict_one(self):
         with contextlib.suppress(Exception):
-            self._cache.popitem(last=False)
+            _, entry = self._cache.popitem(last=False)
+            self._bytes -= entry.nbytes
+
+    def _evict_over_budget(self):
+        """从最久未用的一端淘汰，直到回到字节预算（及可选的条目数上限）以内；最近使用的条目总会保留"""
+        while len(self._cache) > 1 and (
+                self._bytes > self.max_bytes or (self.max_entries and len(self._cache) > self.max_entries)):
+            self._evict_one()
+
+    def _drop(self, book_md5: str):
+        if (entry := self._cache.pop(book_md5, None)) is not None:
+            self._bytes -= entry.nbytes
 
     async def invalidate(self, book_name: str):
         book_md5 = md5(book_name)
         if not (entry := self._cache.get(book_md5)):
             return
         async with entry.lock:
-            with contextlib.suppress(KeyError):
-                del self._cache[book_md5]
+            self._drop(book_md5)
+
+    def estimate_memory(self) -> int:
+        """页面缓存的估算占用（字节）"""
+        return self._bytes
 
+    def get_stats(self) -> dict:
+        return {'entries': len(self._cache), 'bytes': self._bytes, 'max_bytes': self.max_bytes,
+                'prefetch': {**self._prefetch_stats, 'running': len(self._prefetch_tasks)}}
 
     def clear_cache(self):
+        self.cancel_prefetch()
         self._cache.clear()
+        self._bytes = 0
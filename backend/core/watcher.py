@@ -1,57 +1,583 @@
+import os
+import sys
+import time
 import asyncio
+import threading
 import contextlib
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
-from watchdog.events import FileSystemEventHandler
+from watchdog.events import (
+    EVENT_TYPE_MOVED, FileSystemEventHandler, DirCreatedEvent, DirDeletedEvent, FileCreatedEvent, FileDeletedEvent
+)
+from watchdog.observers import Observer
+
+from infra import backend
+from utils import Priority, scheduler
+from utils.mode_strategy import accpect_dir
+from .logging import get_logger
 
 IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp'}
+# 下载器/编辑器的临时文件与未完成文件，完成后通常重命名为正式文件名
+TEMP_SUFFIXES = ('.part', '.partial', '.tmp', '.temp', '.crdownload', '.download', '.aria2', '.!qb', '.swp')
+logger = get_logger()
+
+# 事件路径的层级：系列目录 / 书籍（章节目录、.cbz）/ 书籍内部的图片等文件
+SERIES, BOOK, INNER = 'series', 'book', 'inner'
+UPDATE, REMOVE = 'update', 'remove'
+PERSIST = 'persist'  # 页面列表已在内存中增量更新，到期时只需落库
+
+
+def is_temp_name(name: str) -> bool:
+    return name.startswith(('.', '~')) or name.lower().endswith(TEMP_SUFFIXES)
 
 
 class ComicChangeHandler(FileSystemEventHandler):
-    def __init__(self, cache_manager, pages_handler, main_loop):
+    """
+    合并文件事件的监控处理器
+
+    watchdog 线程只把事件归并到 {(book, ep): 待处理动作} 中（加锁），
+    由事件循环上的单个消费协程按窗口批量应用：
+    - 同一键在 debounce 秒内没有新事件，或距首个事件已达 max_latency 秒时应用一次
+    - 同一系列的到期变更在一个后台任务中依次应用
+    - 移动/重命名直接在 books_index 与 rV.db 中原地改名，不重新扫描
+
+    - 章节目录内图片的增删同样先归并到 {(book, ep): 页面变更}，每次刷新批量按序应用到已缓存的页面列表，
+      下载中的章节无需反复重扫，未缓存的章节每批至多载入一次；临时/未完成文件忽略，无法增量处理的事件才回退到重扫
+
+    ep 为 None 表示系列级变更（整个系列目录新增/删除）。
+    """
+
+    def __init__(self, cache_manager, pages_handler, main_loop, debounce: float = 2.0, max_latency: float = 10.0):
         self.cache = cache_manager
         self.pages_handler = pages_handler
         self.loop = main_loop
-        self._pending_updates = {}
-        self._debounce_delay = 2.0
+        self._debounce_delay = debounce
+        self._max_latency = max_latency
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, Optional[str]], list] = {}  # {(book, ep): [first_seen, last_seen, action]}
+        self._page_changes: Dict[Tuple[str, str], list] = {}  # {(book, ep): [mtime, [(name, added), ...]]}
+        self._renames: List[tuple] = []  # [(old_book, old_ep, new_book, new_ep)]，按发生顺序应用
+        self._renamed: Dict[Tuple[str, Optional[str]], float] = {}  # 近期重命名的目标，用于忽略其子项的移动事件
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.run_coroutine_threadsafe(self._run(), main_loop)
+
+    def stop(self):
+        self._task.cancel()
 
-    def _extract_book_ep(self, event_path: Path) -> tuple:
-        """从事件路径提取 (book, ep)"""
+    # ========== 事件归并（watchdog 线程） ==========
+
+    def _classify(self, event_path: Path) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """从事件路径提取 (book, ep, 层级)，不在扫描目录下时返回 (None, None, None)"""
         with contextlib.suppress(ValueError):
-            relative_path = event_path.relative_to(self.cache.scan_path)
-            if parts := relative_path.parts:
-                if len(parts) == 1:
-                    return parts[0].replace('.cbz', ''), ""
-                book, second = parts[0], parts[1]
+            parts = event_path.relative_to(self.cache.scan_path).parts
+            if parts and not accpect_dir(parts[0]):
+                return None, None, None  # 与扫描一致，忽略 _ 开头的顶层目录（_本子、_save 等）
+            if len(parts) == 1:
+                if parts[0].lower().endswith('.cbz'):
+                    return parts[0][:-4], "", BOOK
+                return parts[0], None, SERIES
+            if len(parts) == 2:
+                book, second = parts
                 if Path(second).suffix.lower() in IMAGE_EXTENSIONS:
-                    return book, ""
-                return book, second.replace('.cbz', '')
-        return None, None
+                    return book, "", INNER
+                return book, second[:-4] if second.lower().endswith('.cbz') else second, BOOK
+            if len(parts) > 2:
+                second = parts[1]
+                return parts[0], second[:-4] if second.lower().endswith('.cbz') else second, INNER
+        return None, None, None
 
-    async def _debounced_update(self, book: str, ep: str):
-        await asyncio.sleep(self._debounce_delay)
-        fs_path = f"{book}/{ep}" if ep else book
-        await self.pages_handler.invalidate(fs_path)
-        await self.cache.update_book_async(book, ep)
-        self._pending_updates.pop((book, ep), None)
+    def _idle(self) -> bool:
+        """没有任何待处理项，调用方需持有 _lock"""
+        return not self._pending and not self._renames and not self._page_changes
 
-    def on_created(self, event):
-        book, ep = self._extract_book_ep(Path(event.src_path))
+    def notify(self, book: str, ep: Optional[str], action: str = UPDATE):
+        """登记一个待处理变更；可在任意线程调用（轮询监控也经由此入口）"""
+        now = time.monotonic()
+        with self._lock:
+            was_idle = self._idle()
+            if item := self._pending.get((book, ep)):
+                item[1] = now
+                if action != PERSIST:  # 落库不覆盖已登记的重扫/移除
+                    item[2] = action
+            else:
+                self._pending[(book, ep)] = [now, now, action]
+        if was_idle:
+            # 只在由空变为非空时跨线程唤醒一次，其余事件由消费协程按窗口收集
+            self.loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _notify_path(self, path: Path, deleted: bool = False):
+        book, ep, level = self._classify(path)
         if not book:
             return
-        key = (book, ep)
-        if key in self._pending_updates:
-            self._pending_updates[key].cancel()
-        task = asyncio.run_coroutine_threadsafe(self._debounced_update(book, ep), self.loop)
-        self._pending_updates[key] = task
+        # 书籍内部文件的删除只需重扫该书籍（清空时由更新流程移除）
+        self.notify(book, ep, REMOVE if deleted and level != INNER else UPDATE)
+
+    def _page_event(self, path: Path, added: bool) -> bool:
+        """书籍目录内单张图片的增删归并到 _page_changes，由消费协程批量增量应用；返回 False 表示无法增量处理"""
+        if backend.config.cbz_mode or path.suffix.lower() not in IMAGE_EXTENSIONS:
+            return False
+        book, ep, level = self._classify(path)
+        if level != INNER or path.parent != self.cache.backend.build_book_path(book, ep):
+            return False
+        try:
+            mtime = path.parent.stat().st_mtime
+        except OSError:
+            return False
+        with self._lock:
+            was_idle = self._idle()
+            item = self._page_changes.setdefault((book, ep), [mtime, []])
+            item[0] = mtime
+            item[1].append((path.name, added))
+        if was_idle:
+            self.loop.call_soon_threadsafe(self._wakeup.set)
+        return True
+
+    def on_created(self, event):
+        path = Path(event.src_path)
+        if is_temp_name(path.name) or (not event.is_directory and self._page_event(path, True)):
+            return
+        self._notify_path(path)
 
     def on_deleted(self, event):
-        book, ep = self._extract_book_ep(Path(event.src_path))
-        if not book:
+        path = Path(event.src_path)
+        if is_temp_name(path.name) or (not event.is_directory and self._page_event(path, False)):
             return
-        fs_path = f"{book}/{ep}" if ep else book
-        asyncio.run_coroutine_threadsafe(self.cache.remove_book_async(book, ep), self.loop)
-        asyncio.run_coroutine_threadsafe(self.pages_handler.invalidate(fs_path), self.loop)
+        self._notify_path(path, deleted=True)
 
     def on_moved(self, event):
-        pass
\ No newline at end of file
+        if not event.is_directory:
+            # 临时文件完成后重命名为图片、页面改名：按删除旧名 + 新增新名增量处理
+            src, dst = Path(event.src_path), Path(event.dest_path)
+            src_done = is_temp_name(src.name) or self._page_event(src, False)
+            if src_done and (is_temp_name(dst.name) or self._page_event(dst, True)):
+                return
+        src_book, src_ep, src_level = self._classify(Path(event.src_path))
+        dst_book, dst_ep, dst_level = self._classify(Path(event.dest_path))
+        if not src_book or not dst_book:
+            # 移出/移入扫描目录等同于删除/新增
+            if src_book:
+                self._notify_path(Path(event.src_path), deleted=True)
+            if dst_book:
+                self._notify_path(Path(event.dest_path))
+            return
+        if self._covered_by_rename(dst_book, dst_ep):
+            return  # 父目录重命名时 watchdog 附带产生的子项移动事件
+        if src_level == dst_level and src_level in (SERIES, BOOK):
+            self._enqueue_rename(src_book, src_ep, dst_book, dst_ep)
+            return
+        self.notify(src_book, src_ep)
+        if (dst_book, dst_ep) != (src_book, src_ep):
+            self.notify(dst_book, dst_ep)
+
+    def _enqueue_rename(self, old_book: str, old_ep: Optional[str], new_book: str, new_ep: Optional[str]):
+        now = time.monotonic()
+        with self._lock:
+            was_idle = self._idle()
+            self._renames.append((old_book, old_ep, new_book, new_ep))
+            self._renamed[(new_book, new_ep)] = now
+            # 旧名下尚未应用的变更转移到新名下
+            for key in [k for k in self._pending if k[0] == old_book and (old_ep is None or k[1] == old_ep)]:
+                self._pending[(new_book, key[1] if old_ep is None else new_ep)] = self._pending.pop(key)
+        if was_idle:
+            self.loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _covered_by_rename(self, book: str, ep: Optional[str]) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            for key, at in list(self._renamed.items()):
+                if now - at > self._max_latency:
+                    del self._renamed[key]
+                elif key[0] == book and (key[1] is None or key[1] == ep):
+                    return True
+        return False
+
+    # ========== 批量应用（事件循环） ==========
+
+    def _take_ready(self) -> Tuple[list, Dict[str, list], float]:
+        """取出已到期的重命名与变更，返回 (renames, {book: [(ep, action)]}, 距下个到期的秒数)"""
+        now = time.monotonic()
+        ready: Dict[str, list] = {}
+        wait = self._debounce_delay
+        with self._lock:
+            renames, self._renames = self._renames, []
+            due_books = set()
+            for (book, _), (first_seen, last_seen, _) in self._pending.items():
+                due = min(last_seen + self._debounce_delay, first_seen + self._max_latency)
+                if due <= now:
+                    due_books.add(book)
+                else:
+                    wait = min(wait, due - now)
+            # 同一系列只要有一项到期，就连同其余待处理项一起应用，每个窗口每个系列只更新一次
+            for key in [k for k in self._pending if k[0] in due_books]:
+                ready.setdefault(key[0], []).append((key[1], self._pending.pop(key)[2]))
+        return renames, ready, wait
+
+    async def _run(self):
+        while True:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._debounce_delay)
+            self._wakeup.clear()
+            while True:
+                renames, ready, wait = self._take_ready()
+                with self._lock:
+                    page_changes, self._page_changes = self._page_changes, {}
+                try:
+                    if renames:
+                        await self._apply_renames(renames)
+                    if page_changes:
+                        self._apply_page_changes(page_changes)
+                    if ready:
+                        await asyncio.gather(*(self._apply_book(book, changes) for book, changes in ready.items()))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Watcher apply error: {e}")
+                with self._lock:
+                    if self._idle():
+                        break
+                await asyncio.sleep(wait)
+
+    def _apply_page_changes(self, page_changes: dict):
+        """按章节依次应用一批页面增删，每个章节只登记一次落库/重扫"""
+        for (book, ep), (mtime, changes) in page_changes.items():
+            applied = True
+            for name, added in changes:
+                if (applied := self.pages_handler.apply_page_change(book, ep, name, added, mtime)) is not True:
+                    break
+            if applied is False:
+                self.notify(book, ep)
+                continue
+            if applied is None:
+                # 未缓存：本批只载入一次（扫描结果已包含本批其余变更），之后的事件增量应用
+                asyncio.ensure_future(self.pages_handler.preload(book, ep))
+            self.notify(book, ep, PERSIST)
+
+    async def _apply_renames(self, renames: list):
+        for old_book, old_ep, new_book, new_ep in renames:
+            await self._invalidate_pages(old_book, old_ep)
+            renamed = await scheduler.run(Priority.BACKGROUND, self.cache.rename_entries, old_book, new_book, old_ep, new_ep)
+            if renamed < 0:
+                # 后端不支持原地改名：按删除 + 新增处理
+                self.notify(old_book, old_ep, REMOVE)
+                self.notify(new_book, new_ep)
+            elif renamed == 0:
+                # 未收录的目录（如刚复制进来的）移动后按新增处理
+                self.notify(new_book, new_ep)
+
+    async def _invalidate_pages(self, book: str, ep: Optional[str]):
+        if ep is None:
+            # 系列级：失效该系列的所有章节
+            for series_ep in self.cache.series_episodes(book) or ():
+                await self.pages_handler.invalidate(f"{book}/{series_ep.ep}" if series_ep.ep else book)
+            await self.pages_handler.invalidate(book)
+        else:
+            await self.pages_handler.invalidate(f"{book}/{ep}" if ep else book)
+
+    def _apply_changes(self, book: str, changes: list):
+        """在后台线程中依次应用同一系列的变更；有系列级变更时一次重扫即覆盖各章节"""
+        if any(ep is None for ep, _ in changes):
+            changes = [(None, UPDATE)]
+        for ep, action in changes:
+            if ep is None:
+                self.cache.refresh_series(book)
+            elif action == REMOVE:
+                self.cache.remove_book(book, ep)
+            elif isinstance(action, tuple):
+                self.cache.apply_pages(book, ep, *action)
+            else:
+                self.cache.update_book_sync(book, ep)
+
+    async def _apply_book(self, book: str, changes: list):
+        resolved = []
+        for ep, action in changes:
+            if action == PERSIST:
+                # 取内存中增量维护的 (mtime, pages) 落库；已被淘汰或正在加载时回退到重扫
+                if (cached := self.pages_handler.peek_pages(book, ep)) is not None:
+                    resolved.append((ep, cached))
+                    continue
+                action = UPDATE
+            await self._invalidate_pages(book, ep)
+            resolved.append((ep, action))
+        await scheduler.run(Priority.BACKGROUND, self._apply_changes, book, resolved)
+
+
+# ========== 混合监控：原生事件 + 目录 mtime 轮询 ==========
+
+NETWORK_FS_TYPES = {'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', '9p', 'afs', 'ncpfs', 'davfs', 'fuse.sshfs', 'fuse.rclone'}
+
+
+def is_network_path(path: Path) -> bool:
+    """路径是否位于网络共享上（SMB/NFS 等收不到原生文件事件）"""
+    path = str(Path(path).resolve())
+    if sys.platform == 'win32':
+        if path.startswith('\\\\'):
+            return True
+        with contextlib.suppress(Exception):
+            import ctypes
+            return ctypes.windll.kernel32.GetDriveTypeW(path[:3]) == 4  # DRIVE_REMOTE
+        return False
+    # Linux：取 /proc/mounts 中最长匹配的挂载点
+    fs_type, mount_len = None, -1
+    with contextlib.suppress(OSError), open('/proc/mounts', encoding='utf-8') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 3:
+                continue
+            mount = parts[1].replace('\\040', ' ')
+            if (path == mount or path.startswith(mount.rstrip('/') + '/')) and len(mount) > mount_len:
+                fs_type, mount_len = parts[2], len(mount)
+    return fs_type in NETWORK_FS_TYPES
+
+
+class DirectoryPoller:
+    """
+    按目录 mtime 轮询未被原生监控覆盖的系列，变化经 ComicChangeHandler.notify 进入同一更新流程
+
+    每 interval 秒一轮，每轮最多 stat budget 个路径，按游标轮转，开销与库大小无关；
+    库越大，完整扫过一遍的周期越长。首次见到的路径只记录基线，不触发更新。
+    watchdog 自带的 PollingObserver 每轮对整棵目录树做快照，大库下开销不可控，故不使用。
+    """
+
+    def __init__(self, handler: ComicChangeHandler, main_loop, interval: float, budget: int, is_native=None,
+                 poll_root: bool = True):
+        self.handler = handler
+        self.cache = handler.cache
+        self.loop = main_loop
+        self.interval = interval
+        self.budget = budget
+        self.is_native = is_native or (lambda series: False)
+        self.poll_root = poll_root  # 扫描目录本身已被原生监控时无需轮询顶层
+        self._mtimes: Dict[Tuple[str, Optional[str]], float] = {}  # {(book, ep): mtime}，ep 为 None 表示系列目录
+        self._root_series: Optional[set] = None
+        self._root_mtime = None
+        self._targets: list = []
+        self._cursor = 0
+        self._task = None
+        self.stats = {'passes': 0, 'stats': 0, 'changes': 0, 'targets': 0}
+
+    def start(self):
+        self._task = asyncio.run_coroutine_threadsafe(self._run(), self.loop)
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await scheduler.run(Priority.BACKGROUND, self.poll_once)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Directory poll error: {e}")
+
+    def _path(self, book: str, ep: Optional[str]) -> Path:
+        return self.cache.scan_path / book if ep is None else self.cache.backend.build_book_path(book, ep)
+
+    def _poll_root(self):
+        """扫描目录本身 mtime 变化时列出顶层，发现新增/删除的系列"""
+        scan_path = self.cache.scan_path
+        try:
+            mtime = scan_path.stat().st_mtime
+        except OSError:
+            return
+        self.stats['stats'] += 1
+        if mtime == self._root_mtime:
+            return
+        self._root_mtime = mtime
+        series = self.cache.backend.collect_series(scan_path)
+        if series is None:
+            return
+        current = set(series)
+        if self._root_series is not None:
+            for name in current ^ self._root_series:
+                self.handler.notify(name, None)
+                self.stats['changes'] += 1
+        self._root_series = current
+
+    def _build_targets(self) -> list:
+        with self.cache._index_lock:
+            aggregates = [a for book, a in self.cache.series_index.items() if not self.is_native(book)]
+            targets = []
+            for aggregate in aggregates:
+                targets.append((aggregate.book, None))
+                targets.extend((aggregate.book, b.ep) for b in aggregate.episodes if b.ep)
+        known = set(targets)
+        for key in [k for k in self._mtimes if k not in known]:
+            del self._mtimes[key]
+        return targets
+
+    def poll_once(self):
+        if self.poll_root:
+            self._poll_root()
+        if self._cursor >= len(self._targets):
+            self._targets, self._cursor = self._build_targets(), 0
+            self.stats['targets'] = len(self._targets)
+        end = min(self._cursor + self.budget, len(self._targets))
+        for book, ep in self._targets[self._cursor:end]:
+            self.stats['stats'] += 1
+            try:
+                mtime = self._path(book, ep).stat().st_mtime
+            except OSError:
+                mtime = None
+            key = (book, ep)
+            if key not in self._mtimes:
+                if mtime is not None:
+                    self._mtimes[key] = mtime
+                continue
+            if mtime != self._mtimes[key]:
+                # 系列目录变化（章节增删）重扫该系列；章节变化只更新该章节，消失时由更新流程移除
+                self.handler.notify(book, ep)
+                self.stats['changes'] += 1
+                if mtime is None:
+                    del self._mtimes[key]
+                else:
+                    self._mtimes[key] = mtime
+        self._cursor = end
+        self.stats['passes'] += 1
+
+
+class _EventRouter(FileSystemEventHandler):
+    """单个 Observer 的事件分发：按最长匹配的扫描目录交给对应库的处理器，跨库移动拆成删除 + 新增"""
+
+    def __init__(self, handlers: List[ComicChangeHandler]):
+        self._routes = sorted(((str(h.cache.scan_path), h) for h in handlers), key=lambda r: len(r[0]), reverse=True)
+
+    def _route(self, path: str) -> Optional[ComicChangeHandler]:
+        for prefix, handler in self._routes:
+            if path == prefix or path.startswith(prefix + os.sep):
+                return handler
+        return None
+
+    def dispatch(self, event):
+        src = self._route(event.src_path)
+        if event.event_type == EVENT_TYPE_MOVED and (dst := self._route(event.dest_path)) is not src:
+            # 如在根目录与 _本子 之间移动：源库按删除、目标库按新增处理
+            if src:
+                src.dispatch(DirDeletedEvent(event.src_path) if event.is_directory else FileDeletedEvent(event.src_path))
+            if dst:
+                dst.dispatch(DirCreatedEvent(event.dest_path) if event.is_directory else FileCreatedEvent(event.dest_path))
+            return
+        if src:
+            src.dispatch(event)
+
+
+class LibraryWatcher:
+    """
+    同一路径下各库（非 ero 与 _本子）共用的文件监控，按配置与挂载类型组合原生事件与轮询
+
+    - native：对扫描目录递归使用原生事件（不限预算）
+    - poll：全部轮询
+    - auto（默认）：网络盘全部轮询；本地盘预计所需的监控目录数在 max_watches 内时递归原生监控，
+      否则对各扫描目录本身非递归监控（感知系列增删），按最近更新排序的系列在预算内递归监控，其余系列轮询
+
+    所有原生监控共用一个 Observer，事件经 _EventRouter 分发到各库的 ComicChangeHandler。
+    """
+    DEFAULT_MAX_WATCHES = 8192
+    DEFAULT_POLL_INTERVAL = 30
+    DEFAULT_POLL_BUDGET = 2000
+
+    def __init__(self, libraries: list, main_loop):
+        """libraries: [(ComicCacheManager, BookPagesHandler), ...]"""
+        self.handlers = [ComicChangeHandler(cache, pages_handler, main_loop) for cache, pages_handler in libraries]
+        self.caches = [h.cache for h in self.handlers]
+        self.loop = main_loop
+        self.observer = None
+        self.pollers: List[DirectoryPoller] = []
+        self.mode = None
+        self.needs_replan = False
+        self._native_series: Optional[Dict[ComicChangeHandler, set]] = None  # None 表示各扫描目录整体递归原生监控
+
+    def _watches_needed(self, aggregate) -> int:
+        # CBZ 模式下章节是文件，只需监控系列目录
+        return 1 if backend.config.cbz_mode else 1 + aggregate.ep_count
+
+    def _plan_native_series(self, max_watches: int) -> Optional[Dict[ComicChangeHandler, set]]:
+        """返回各库需要单独递归监控的系列；全部可在预算内覆盖时返回 None
+
+        首次扫描未完成时无法估算目录数，先只监控顶层、其余轮询，扫描完成后由调用方重新规划
+        """
+        plan = {h: set() for h in self.handlers}
+        if any(c.progress.running or c.cache_state() != 'complete' for c in self.caches):
+            self.needs_replan = True
+            return plan
+        candidates = []
+        for handler in self.handlers:
+            with handler.cache._index_lock:
+                candidates.extend((a.latest_mtime, handler, a.book, self._watches_needed(a))
+                                  for a in handler.cache.series_index.values())
+        used = len(self.handlers)  # 各扫描目录本身各占 1 个
+        if used + sum(c[3] for c in candidates) <= max_watches:
+            return None
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        for _, handler, book, n in candidates:
+            if used + n > max_watches:
+                break
+            plan[handler].add(book)
+            used += n
+        return plan
+
+    def _schedule(self, path: str, recursive: bool):
+        with contextlib.suppress(OSError):
+            self.observer.schedule(self.router, path, recursive=recursive)
+
+    def start(self):
+        conf = backend.config.watcher
+        mode = conf.get('mode', 'auto')
+        if mode == 'auto':
+            mode = 'poll' if any(is_network_path(c.scan_path) for c in self.caches) else 'hybrid'
+        self.router = _EventRouter(self.handlers)
+        self._native_series = None
+        if mode in ('native', 'hybrid'):
+            if mode == 'hybrid':
+                self._native_series = self._plan_native_series(int(conf.get('max_watches', self.DEFAULT_MAX_WATCHES)))
+            self.observer = Observer()
+            scan_paths = sorted((str(c.scan_path) for c in self.caches if c.scan_path.exists()), key=len)
+            if self._native_series is None:
+                # 嵌套的扫描目录（_本子 位于根目录下）已被外层递归监控覆盖
+                for i, path in enumerate(scan_paths):
+                    if not any(path.startswith(outer + os.sep) for outer in scan_paths[:i]):
+                        self._schedule(path, recursive=True)
+            else:
+                for path in scan_paths:
+                    self._schedule(path, recursive=False)
+                for handler, series in self._native_series.items():
+                    for book in series:
+                        self._schedule(os.path.join(handler.cache.scan_path, book), recursive=True)
+            self.observer.start()
+        if mode == 'poll' or self._native_series is not None:
+            for handler in self.handlers:
+                native = (self._native_series or {}).get(handler, set())
+                poller = DirectoryPoller(
+                    handler, self.loop,
+                    float(conf.get('poll_interval', self.DEFAULT_POLL_INTERVAL)),
+                    int(conf.get('poll_budget', self.DEFAULT_POLL_BUDGET)),
+                    is_native=None if mode == 'poll' else native.__contains__, poll_root=mode == 'poll')
+                poller.start()
+                self.pollers.append(poller)
+        self.mode = mode
+        logger.info(f"Watching {', '.join(str(c.scan_path) for c in self.caches)}: mode={mode}, "
+                    f"native_series={self._native_count()}")
+
+    def _native_count(self):
+        if self._native_series is None:
+            return 'all' if self.observer else 0
+        return sum(len(series) for series in self._native_series.values())
+
+    def stop(self):
+        if self.observer and self.observer.is_alive():
+            self.observer.stop()
+            self.observer.join()
+        self.observer = None
+        for poller in self.pollers:
+            poller.stop()
+        self.pollers = []
+        # 未到期的合并事件随之丢弃，下次增量同步会按系列 mtime 补上
+        for handler in self.handlers:
+            handler.stop()
+
+    def get_stats(self) -> dict:
+        return {'mode': self.mode, 'native_series': self._native_count(),
+                'poll': {int(p.cache.ero): dict(p.stats) for p in self.pollers} or None}
@@ -80,6 +80,21 @@ class ConfigBackend(ABC):
     def cbz_mode(self) -> bool:
         return self.get('cbz_mode', False)
     
+    @property
+    def library_cache(self) -> dict:
+        """已访问库的缓存上限：max_instances（个数）、max_memory_mb（估算内存）、page_cache_mb（每个库的页面列表缓存）、image_cache_mb（CBZ 解压图片缓存）"""
+        return self.get('library_cache', {}) or {}
+
+    @property
+    def prefetch(self) -> dict:
+        """打开章节时预读下一章：enabled（默认开启）、images（额外预热的前几张图片，默认 0）"""
+        return self.get('prefetch', {}) or {}
+
+    @property
+    def watcher(self) -> dict:
+        """文件监控：mode（auto/native/poll）、max_watches（原生监控目录数预算）、poll_interval（秒）、poll_budget（每轮 stat 上限）"""
+        return self.get('watcher', {}) or {}
+
     @property
     def scroll_conf(self) -> dict:
         return self.get('scrollConf', {})
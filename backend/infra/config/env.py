@@ -22,9 +22,12 @@ class EnvConfigBackend(ConfigBackend):
         'locks': 'RV_LOCKS',
         'root_whitelist': 'RV_WHITELIST',
         'scrollConf': 'RV_SCROLL_CONF',
+        'library_cache': 'RV_LIBRARY_CACHE',
+        'prefetch': 'RV_PREFETCH',
+        'watcher': 'RV_WATCHER',
     }
     
-    JSON_KEYS = {'locks', 'root_whitelist', 'scrollConf'}
+    JSON_KEYS = {'locks', 'root_whitelist', 'scrollConf', 'library_cache', 'prefetch', 'watcher'}
     
     DEFAULTS = {
         'path': '/tmp/comic',
@@ -55,7 +58,7 @@ class EnvConfigBackend(ConfigBackend):
             try:
                 return json.loads(value)
             except json.JSONDecodeError:
-                return {} if key in ('locks', 'scrollConf') else []
+                return {} if key in ('locks', 'scrollConf', 'library_cache', 'prefetch', 'watcher') else []
         return value
     
     def set(self, key: str, value: Any) -> bool:
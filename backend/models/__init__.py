@@ -1,3 +1,3 @@
-from .book import BookData, QuerySort, BookSort
+from .book import BookData, BooksIndex, SeriesAggregate, SeriesIndex, QuerySort, BookSort
 
-__all__ = ['BookData', 'QuerySort', 'BookSort']
\ No newline at end of file
+__all__ = ['BookData', 'BooksIndex', 'SeriesAggregate', 'SeriesIndex', 'QuerySort', 'BookSort']
@@ -1,26 +1,47 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 import re
-from typing import TYPE_CHECKING
+from functools import lru_cache
+from sys import intern
+from typing import Optional, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from storage.base import StorageBackend
 
 
 class BookData:
+    # 单个库可能有数十万条目：使用 __slots__ 去掉实例 __dict__，并驻留重复出现的字符串
+    # （同一系列的 book、常见的 ep 名如 "第1话"、首图名如 "001.jpg"），backend 为共享引用
+    # 排序键只存紧凑值：ep_num 为 int，section 为共享的 (卷/话优先级, 编号)；name 与 section_key 按需派生
+    __slots__ = ('book', 'ep', 'mtime', 'first_img', 'ero', 'backend', 'section', 'ep_num')
+
     def __init__(self, book: str, ep: str, mtime: float, first_img: str = None, ero=0, backend: 'StorageBackend' = None):
-        self.book = book
-        self.ep = ep
+        self.book = intern(book)
+        self.ep = intern(ep)
         self.mtime = mtime
-        self.first_img = first_img
+        self.first_img = intern(first_img) if first_img else first_img
         self.ero = ero
         self.backend = backend
+        self.section = BookSort.section_of(self.book, self.ep)  # 不带 话/卷 编号时为 None
+        self.ep_num = BookSort.episode_num(self.ep)
 
     @property
     def name(self) -> str:
         """display_name: 用于排序和显示"""
         return f"{self.book}_{self.ep}" if self.ep else self.book
 
+    @property
+    def section_key(self) -> Optional[tuple]:
+        """(书名, 卷/话优先级, 编号)，与 BookSort.section_key(self.name) 一致"""
+        if self.section is None:
+            return None
+        return (self.book.split('_')[0], *self.section)
+
+    @property
+    def has_section(self) -> bool:
+        """名称中带 话/卷 编号"""
+        return self.section is not None
+
     @property
     def fs_path(self) -> str:
         """相对于 scan_path 的文件系统路径"""
@@ -31,17 +52,100 @@ class BookData:
         return {"book": self.book, "ep": self.ep, "first_img": first_img}
 
 
+class BooksIndex(dict):
+    """书籍内存索引 {(book, ep): BookData}
+
+    保持 dict 的查找接口；键元组与 BookData 共享驻留后的字符串。
+    """
+    __slots__ = ()
+
+    def put(self, book_data: BookData) -> BookData:
+        self[(book_data.book, book_data.ep)] = book_data
+        return book_data
+
+
+class SeriesAggregate:
+    """单个系列的聚合：章节列表、最新 mtime、章节数与封面（编号最小的章节）
+
+    无章节的单本书籍也作为一个系列，ep_count 为 0。
+    """
+    __slots__ = ('book', 'episodes', 'latest_mtime', 'ep_count', 'cover')
+
+    def __init__(self, book: str):
+        self.book = book
+        self.episodes = []
+        self.latest_mtime = 0.0
+        self.ep_count = 0
+        self.cover = None
+
+    def refresh(self):
+        """章节增删后重算聚合值，O(章节数)"""
+        eps = self.episodes
+        self.latest_mtime = max((b.mtime for b in eps), default=0.0)
+        self.ep_count = sum(1 for b in eps if b.ep)
+        self.cover = min(eps, key=lambda b: b.ep_num, default=None)
+
+    def sorted_episodes(self) -> list:
+        return sorted((b for b in self.episodes if b.ep), key=lambda b: b.ep_num)
+
+    def to_api(self):
+        return {"book": self.book, "first_img": self.cover.to_api()["first_img"] if self.cover else None,
+                "ep_count": self.ep_count, "mtime": self.latest_mtime}
+
+
+class SeriesIndex(dict):
+    """系列聚合索引 {book: SeriesAggregate}，随 books_index 增量维护"""
+    __slots__ = ()
+
+    def add(self, book_data: BookData) -> SeriesAggregate:
+        if (series := self.get(book_data.book)) is None:
+            series = self[book_data.book] = SeriesAggregate(book_data.book)
+        series.episodes.append(book_data)
+        return series
+
+    def discard(self, book_data: BookData) -> Optional[SeriesAggregate]:
+        """移除条目；系列变空时一并删除并返回 None"""
+        if (series := self.get(book_data.book)) is None:
+            return None
+        try:
+            series.episodes.remove(book_data)
+        except ValueError:
+            pass
+        if not series.episodes:
+            del self[book_data.book]
+            return None
+        return series
+
+    def rebuild(self, books):
+        self.clear()
+        for book_data in books:
+            self.add(book_data)
+        for series in self.values():
+            series.refresh()
+
+
 class BookSort:
     """书籍章节排序辅助类"""
     section_regex = re.compile(r'_第?(\d+\.?\d*)([话卷])')
     volume_regex = re.compile(r'_第?(\d+\.?\d*)卷')
+    num_regex = re.compile(r'\d+')
 
     @classmethod
     def by_section(cls, book_with_section):
+        return cls.section_key(book_with_section) or (book_with_section.split('_')[0], 2, 0)
+
+    @classmethod
+    def get_sort_key(cls, book):
+        name, priority, num = cls.by_section(book)
+        return (name, priority, num)
+
+    @classmethod
+    def section_key(cls, book_with_section) -> Optional[tuple]:
+        """(书名, 卷/话优先级, 编号)，不带 话/卷 编号时返回 None；书名部分驻留，同系列条目共享"""
         _s = cls.section_regex.search(book_with_section)
-        book_name = book_with_section.split('_')[0]
         if not _s:
-            return book_name, 2, 0
+            return None
+        book_name = intern(book_with_section.split('_')[0])
         num = float(_s.group(1))
         type_ = _s.group(2)
         priority = 0 if type_ == '卷' else 1
@@ -50,16 +154,42 @@ class BookSort:
         return book_name, priority, num
 
     @classmethod
-    def get_sort_key(cls, book):
-        name, priority, num = cls.by_section(book)
-        return (name, priority, num)
+    def section_of(cls, book: str, ep: str) -> Optional[tuple]:
+        """与 section_key(f"{book}_{ep}") 的后两项一致；按 book、ep 分别解析并缓存，结果元组在条目间共享"""
+        section = _parse_section(book) or (_parse_section('_' + ep) if ep else None)
+        if section is not None and section[0] == 0 and ('番外' in book or '番外' in ep):
+            section = _shared_section(0, section[1] + 0.5)
+        return section
+
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def episode_num(ep: str) -> int:
+        """提取章节名中的数字用于排序，提取失败返回0；同名章节共享同一个 int"""
+        return int(m.group()) if (m := BookSort.num_regex.search(ep)) else 0
+
+
+_sections = {}
+
+
+@lru_cache(maxsize=65536)
+def _parse_section(text: str) -> Optional[tuple]:
+    # 名称中的 "_" 分隔 book 与 ep，编号不会跨越两者，分别匹配即可
+    _s = BookSort.section_regex.search(text)
+    if not _s:
+        return None
+    return _shared_section(0 if _s.group(2) == '卷' else 1, float(_s.group(1)))
+
+
+def _shared_section(priority: int, num: float) -> tuple:
+    return _sections.setdefault((priority, num), (priority, num))
 
 
 class QuerySort:
     """Comic 查询排序类"""
     sort_funcs = {
         'time': lambda x: x.mtime,
-        'name': lambda x: x.name
+        'name': lambda x: x.name,
+        'section': lambda x: x.section_key,
     }
     
     sort_directions = {
@@ -80,8 +210,8 @@ class QuerySort:
     @property
     def reverse(self):
         return self.sort_directions[self._sort]
-    
-    @classmethod
-    def check_name(cls, books_data):
-        if all(bool(BookSort.section_regex.search(book.name)) for book in books_data):
-            cls.sort_funcs['name'] = lambda x: BookSort.get_sort_key(x.name)
\ No newline at end of file
+
+    def check_name(self, section_covered: bool):
+        """全部条目都带 话/卷 编号时，本次查询的名称排序改按章节排序（不修改类属性）"""
+        if self.func == 'name' and section_covered:
+            self.func = 'section'
@@ -12,7 +12,7 @@ from typing import List, Optional, Dict, Tuple, TYPE_CHECKING
 from pathlib import Path
 
 if TYPE_CHECKING:
-    from models import BookData
+    from models import BooksIndex
 
 
 class StorageBackend(ABC):
@@ -39,6 +39,29 @@ class StorageBackend(ABC):
         返回：书籍路径列表（本地模式为 Path，R2 模式可能为虚拟路径）
         """
 
+    def collect_series(self, scan_path: Path) -> Optional[Dict[str, float]]:
+        """收集顶层系列目录及其 mtime，用于增量同步
+
+        返回：{series_name: mtime}；返回 None 表示不支持，调用方应回退到全量比对
+        """
+        return None
+
+    def collect_series_book_paths(self, scan_path: Path, series: str) -> List[Path]:
+        """收集单个顶层系列下的书籍路径"""
+        return []
+
+    def scan_series(self, scan_path: str, series: str, return_all: bool = False) -> List[Tuple[str, str, float, str]]:
+        """扫描单个顶层系列，返回 [(book, ep, mtime, first_img), ...]；return_all 时第 4 项为页面列表
+
+        默认实现逐个调用 scan_book，子类可提供更轻量的实现
+        """
+        rows = []
+        for path in self.collect_series_book_paths(Path(scan_path), series):
+            if result := self.scan_book(path, Path(scan_path), return_all):
+                _, parent_name, chapter_name, mtime, first_img = result
+                rows.append((parent_name, "" if chapter_name == parent_name else chapter_name, mtime, first_img))
+        return rows
+
     @abstractmethod
     def scan_book(self, book_path: Path, scan_path: Path, return_all: bool = False) -> Optional[Tuple]:
         """扫描单本书籍
@@ -61,10 +84,10 @@ class StorageBackend(ABC):
         """检查缓存是否已初始化（是否需要全量扫描）"""
 
     @abstractmethod
-    def load_books_from_cache(self) -> Dict[Tuple[str, str], 'BookData']:
+    def load_books_from_cache(self) -> 'BooksIndex':
         """从缓存加载所有书籍
 
-        返回：{(book, ep): BookData} 字典
+        返回：BooksIndex，即 {(book, ep): BookData} 字典
         """
 
     @abstractmethod
@@ -82,6 +105,13 @@ class StorageBackend(ABC):
     def remove_book_from_cache(self, book: str, ep: str):
         """从缓存移除书籍"""
 
+    def rename_books(self, old_book: str, new_book: str, old_ep: Optional[str] = None, new_ep: Optional[str] = None) -> bool:
+        """原地重命名缓存条目：old_ep 为 None 时重命名整个系列
+
+        返回 False 表示不支持，调用方应回退到重新扫描
+        """
+        return False
+
     @abstractmethod
     def set_book_handle(self, book: str, ep: str, handle: str):
         """设置书籍的 handle 标记"""
@@ -90,6 +120,57 @@ class StorageBackend(ABC):
     def reset_cache(self):
         """重置缓存（用于强制重新扫描）"""
 
+    # ========== 页面列表缓存（可选）==========
+
+    def load_pages(self, book: str, ep: str) -> Optional[Tuple[float, List[str]]]:
+        """读取持久化的页面列表，返回 (采集时的 mtime, pages)；没有记录时返回 None"""
+        return None
+
+    def save_pages_batch(self, pages_data: List[Tuple]):
+        """持久化页面列表 [(book, ep, mtime, pages), ...]"""
+
+    # ========== CBZ 成员索引（可选）==========
+
+    def load_cbz_indexes(self, paths: List[str]) -> Dict[str, Tuple[int, int, str]]:
+        """按相对路径批量读取持久化的成员索引，返回 {path: (size, mtime_ns, members_json)}"""
+        return {}
+
+    def save_cbz_indexes(self, rows: List[Tuple[str, int, int, str]]):
+        """持久化成员索引 [(path, size, mtime_ns, members_json), ...]"""
+
+    # ========== 全量扫描断点（崩溃后续扫）==========
+
+    def get_cache_state(self) -> str:
+        """缓存状态：complete（完整）/ partial（上次全量扫描未完成）/ empty（从未扫描）"""
+        return 'complete' if self.is_cache_available() else 'empty'
+
+    def begin_scan(self) -> Tuple[Optional[str], set]:
+        """开始或恢复一次全量扫描
+
+        返回：(generation, 已完成的系列集合)；存在未完成的扫描时沿用其 generation
+        """
+        return None, set()
+
+    def save_scan_chunk(self, books_data: List[Tuple], series_mtimes: List[Tuple[str, float]], generation: Optional[str],
+                        pages_data: List[Tuple] = None):
+        """提交一块扫描结果：条目、系列 mtime、已完成系列的断点与页面列表"""
+        self.save_books_batch(books_data)
+        self.update_dir_mtime_cache_batch(series_mtimes)
+        if pages_data:
+            self.save_pages_batch(pages_data)
+
+    def finish_scan(self, generation: Optional[str]):
+        """标记全量扫描完成"""
+
+    # ========== 搜索（可选）==========
+
+    def search_books(self, query: str, limit: int, offset: int = 0) -> Optional[List[Tuple[str, str]]]:
+        """按书名/章节名搜索，返回按相关度排序的 [(book, ep), ...]
+
+        返回 None 表示后端不支持，由调用方在内存索引中过滤
+        """
+        return None
+
     # ========== 目录 mtime 缓存操作（增量同步优化）==========
 
     def get_cached_dir_mtime(self, dir_name: str) -> Optional[float]:
@@ -102,6 +183,9 @@ class StorageBackend(ABC):
     def update_dir_mtime_cache_batch(self, entries: List[Tuple[str, float]]):
         """批量更新目录 mtime 缓存"""
 
+    def remove_dir_mtime_cache(self, dir_names: List[str]):
+        """移除已不存在目录的 mtime 缓存"""
+
     def load_all_dir_mtimes(self) -> Dict[str, float]:
         """加载所有目录 mtime 缓存"""
         return {}
@@ -125,8 +209,8 @@ class StorageBackend(ABC):
         """
 
     @abstractmethod
-    def format_pages_for_api(self, book: str, ep: str, pages: List[str]) -> dict:
-        """格式化页面列表供 API 返回
+    def format_pages_for_api(self, book: str, ep: str, pages: List[str], mtime: Optional[float] = None) -> dict:
+        """格式化页面列表供 API 返回，mtime 为书籍的 mtime（可用于生成带版本的 URL）
 
         返回：{"pages": [...], "page_count": n}
         """
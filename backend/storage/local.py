@@ -7,6 +7,9 @@ preserving all existing functionality including SQLite cache (rV.db) and
 Directory/CBZ mode strategies.
 """
 
+import json
+import time
+import uuid
 import sqlite3
 from pathlib import Path
 from typing import List, Optional, Dict, Tuple
@@ -14,7 +17,8 @@ from urllib.parse import quote
 
 from utils import Var
 from utils.mode_strategy import ModeStrategyFactory
-from models import BookData
+from utils.cbz_index import archive_version
+from models import BookData, BooksIndex
 from watchdog.observers import Observer
 from infra import backend
 from .base import StorageBackend
@@ -40,7 +44,10 @@ class LocalStorageBackend(StorageBackend):
         self._create_table()
 
     def _get_conn(self):
-        return sqlite3.connect(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        # INSERT OR REPLACE 删除旧行时也触发 DELETE 触发器，保证全文索引同步
+        conn.execute('PRAGMA recursive_triggers = ON')
+        return conn
 
     def _create_table(self):
         with self._get_conn() as conn:
@@ -67,12 +74,100 @@ class LocalStorageBackend(StorageBackend):
                     UNIQUE(path, ero)
                 )
             """)
+            # 全量扫描状态与断点：status 为 running 表示上次扫描未完成，可按已完成的系列续扫
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS `scan_state` (
+                    `ero` INTEGER PRIMARY KEY,
+                    `generation` TEXT NOT NULL,
+                    `status` TEXT NOT NULL,
+                    `started_at` REAL,
+                    `finished_at` REAL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS `scan_checkpoint` (
+                    `generation` TEXT NOT NULL,
+                    `ero` INTEGER NOT NULL DEFAULT 0,
+                    `series` TEXT NOT NULL,
+                    UNIQUE(generation, ero, series)
+                )
+            """)
+            # 页面列表缓存：mtime 为采集时书籍的 mtime，不一致即视为失效
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS `pages` (
+                    `book` TEXT NOT NULL,
+                    `ep` TEXT NOT NULL DEFAULT '',
+                    `ero` INTEGER NOT NULL DEFAULT 0,
+                    `mtime` REAL NOT NULL,
+                    `pages` TEXT NOT NULL,
+                    UNIQUE(book, ep, ero)
+                )
+            """)
+            # CBZ 成员索引：path 相对于 comic_path，size / mtime_ns 与归档不一致即视为失效
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS `cbz_index` (
+                    `path` TEXT PRIMARY KEY,
+                    `size` INTEGER NOT NULL,
+                    `mtime_ns` INTEGER NOT NULL,
+                    `members` TEXT NOT NULL
+                )
+            """)
+        self._fts_available = self._create_search_index()
+
+    def _create_search_index(self) -> bool:
+        """创建 episodes 的 FTS5 trigram 全文索引，由触发器与 episodes 保持同步，只收录 exist = 1 的条目
+
+        SQLite 低于 3.34 时没有 trigram 分词器，返回 False，搜索退回内存过滤。
+        另建书名的不区分大小写索引，供不足 3 个字符的短词按前缀范围查找
+        """
+        with self._get_conn() as conn:
+            conn.execute('CREATE INDEX IF NOT EXISTS `idx_episodes_book_nocase` ON episodes (ero, book COLLATE NOCASE)')
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'episodes_fts'"
+            ).fetchone()
+            if exists:
+                return True
+            try:
+                conn.execute("""
+                    CREATE VIRTUAL TABLE `episodes_fts` USING fts5(
+                        book, ep, content='episodes', content_rowid='id', tokenize='trigram'
+                    )
+                """)
+            except sqlite3.OperationalError:
+                return False
+            # UPDATE 只用一个触发器：先按旧值删除、再按新值插入。SQLite 按创建的逆序触发多个触发器，
+            # 拆成两个会先插入新值再删除旧值，新旧名共有的 trigram 随之丢失
+            conn.executescript("""
+                CREATE TRIGGER IF NOT EXISTS `episodes_fts_ai` AFTER INSERT ON episodes WHEN new.exist = 1 BEGIN
+                    INSERT INTO episodes_fts (rowid, book, ep) VALUES (new.id, new.book, new.ep);
+                END;
+                CREATE TRIGGER IF NOT EXISTS `episodes_fts_ad` AFTER DELETE ON episodes WHEN old.exist = 1 BEGIN
+                    INSERT INTO episodes_fts (episodes_fts, rowid, book, ep) VALUES ('delete', old.id, old.book, old.ep);
+                END;
+                CREATE TRIGGER IF NOT EXISTS `episodes_fts_au` AFTER UPDATE OF book, ep, exist ON episodes BEGIN
+                    INSERT INTO episodes_fts (episodes_fts, rowid, book, ep)
+                        SELECT 'delete', old.id, old.book, old.ep WHERE old.exist = 1;
+                    INSERT INTO episodes_fts (rowid, book, ep) SELECT new.id, new.book, new.ep WHERE new.exist = 1;
+                END;
+            """)
+            # 已有数据库：回填现有条目
+            conn.execute('INSERT INTO episodes_fts (rowid, book, ep) SELECT id, book, ep FROM episodes WHERE exist = 1')
+        return True
 
     # ========== 文件系统操作 ==========
 
     def collect_book_paths(self, scan_path: Path) -> List[Path]:
         return self.mode_strategy.collect_book_paths(scan_path)
 
+    def collect_series(self, scan_path: Path) -> Optional[Dict[str, float]]:
+        return self.mode_strategy.collect_series(scan_path)
+
+    def collect_series_book_paths(self, scan_path: Path, series: str) -> List[Path]:
+        return self.mode_strategy.collect_series_book_paths(scan_path, series)
+
+    def scan_series(self, scan_path: str, series: str, return_all: bool = False) -> List[Tuple[str, str, float, str]]:
+        return self.mode_strategy.scan_series(str(scan_path), series, return_all)
+
     def scan_book(self, book_path: Path, scan_path: Path, return_all: bool = False) -> Optional[Tuple]:
         return self.mode_strategy.scan_book(book_path, scan_path, return_all)
 
@@ -88,27 +183,86 @@ class LocalStorageBackend(StorageBackend):
     # ========== 缓存/数据库操作 ==========
 
     def is_cache_available(self) -> bool:
+        return self.get_cache_state() == 'complete'
+
+    def get_cache_state(self) -> str:
         with self._get_conn() as conn:
             cursor = conn.cursor()
+            cursor.execute('SELECT status FROM scan_state WHERE ero = ?', (self.ero,))
+            if row := cursor.fetchone():
+                return 'complete' if row[0] == 'complete' else 'partial'
+            # 没有扫描状态记录的旧数据库：有条目即视为完整
             cursor.execute('SELECT 1 FROM episodes WHERE ero = ? LIMIT 1', (self.ero,))
-            return cursor.fetchone() is not None
+            return 'complete' if cursor.fetchone() is not None else 'empty'
+
+    def begin_scan(self) -> Tuple[Optional[str], set]:
+        with self._get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT generation, status FROM scan_state WHERE ero = ?', (self.ero,))
+            row = cursor.fetchone()
+            if row and row[1] == 'running':
+                generation = row[0]
+                cursor.execute(
+                    'SELECT series FROM scan_checkpoint WHERE generation = ? AND ero = ?',
+                    (generation, self.ero)
+                )
+                return generation, {r[0] for r in cursor.fetchall()}
+            generation = uuid.uuid4().hex
+            conn.execute('DELETE FROM scan_checkpoint WHERE ero = ?', (self.ero,))
+            conn.execute(
+                '''INSERT OR REPLACE INTO scan_state (ero, generation, status, started_at, finished_at)
+                   VALUES (?, ?, 'running', ?, NULL)''',
+                (self.ero, generation, time.time())
+            )
+            return generation, set()
+
+    def save_scan_chunk(self, books_data: List[Tuple], series_mtimes: List[Tuple[str, float]], generation: Optional[str],
+                        pages_data: List[Tuple] = None):
+        # 条目、系列 mtime 与断点在同一事务中提交，中断时不会出现"已记断点但条目未落库"
+        with self._get_conn() as conn:
+            if pages_data:
+                self._write_pages(conn, pages_data)
+            if books_data:
+                conn.executemany(
+                    '''INSERT OR REPLACE INTO episodes (book, ep, exist, mtime, first_img, ero)
+                       VALUES (?, ?, 1, ?, ?, ?)''',
+                    books_data
+                )
+            if series_mtimes:
+                conn.executemany(
+                    '''INSERT OR REPLACE INTO dir_mtime_cache (path, mtime, ero)
+                       VALUES (?, ?, ?)''',
+                    [(path, mtime, self.ero) for path, mtime in series_mtimes]
+                )
+                if generation:
+                    conn.executemany(
+                        'INSERT OR IGNORE INTO scan_checkpoint (generation, ero, series) VALUES (?, ?, ?)',
+                        [(generation, self.ero, path) for path, _ in series_mtimes]
+                    )
+
+    def finish_scan(self, generation: Optional[str]):
+        with self._get_conn() as conn:
+            conn.execute(
+                "UPDATE scan_state SET status = 'complete', finished_at = ? WHERE ero = ? AND generation = ?",
+                (time.time(), self.ero, generation)
+            )
+            conn.execute('DELETE FROM scan_checkpoint WHERE ero = ?', (self.ero,))
 
-    def load_books_from_cache(self) -> Dict[Tuple[str, str], 'BookData']:
-        books_index = {}
+    def load_books_from_cache(self) -> BooksIndex:
+        books_index = BooksIndex()
         incomplete_entries = []
 
         with self._get_conn() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
+            # 逐行迭代游标，不先 fetchall 出整张表
+            cursor = conn.execute(
                 'SELECT book, ep, mtime, first_img, ero FROM episodes WHERE exist = 1 and ero = ?',
                 (self.ero,)
             )
-            for row in cursor.fetchall():
-                book, ep, mtime, first_img, ero = row
+            for book, ep, mtime, first_img, ero in cursor:
                 if mtime is None or first_img is None:
                     incomplete_entries.append((book, ep))
                 else:
-                    books_index[(book, ep)] = BookData(book, ep, mtime, first_img, ero, self)
+                    books_index.put(BookData(book, ep, mtime, first_img, ero, self))
 
         # 修复不完整条目
         if incomplete_entries:
@@ -118,7 +272,7 @@ class LocalStorageBackend(StorageBackend):
                 if result := self.scan_book(book_path, self.scan_path):
                     _, _, _, mtime, first_img = result
                     updates.append((mtime, first_img, book, ep))
-                    books_index[(book, ep)] = BookData(book, ep, mtime, first_img, self.ero, self)
+                    books_index.put(BookData(book, ep, mtime, first_img, self.ero, self))
             if updates:
                 with self._get_conn() as conn:
                     conn.executemany(
@@ -148,6 +302,24 @@ class LocalStorageBackend(StorageBackend):
     def remove_book_from_cache(self, book: str, ep: str):
         with self._get_conn() as conn:
             conn.execute('UPDATE episodes SET exist = 0 WHERE book = ? AND ep = ?', (book, ep))
+            conn.execute('DELETE FROM pages WHERE book = ? AND ep = ? AND ero = ?', (book, ep, self.ero))
+
+    def rename_books(self, old_book: str, new_book: str, old_ep: Optional[str] = None, new_ep: Optional[str] = None) -> bool:
+        # UPDATE OR REPLACE：目标名下已有（如曾被 handle 过的）旧记录时直接覆盖
+        with self._get_conn() as conn:
+            if old_ep is None:
+                conn.execute('UPDATE OR REPLACE episodes SET book = ? WHERE book = ? AND ero = ? AND exist = 1',
+                             (new_book, old_book, self.ero))
+                conn.execute('UPDATE OR REPLACE pages SET book = ? WHERE book = ? AND ero = ?',
+                             (new_book, old_book, self.ero))
+                conn.execute('UPDATE OR REPLACE dir_mtime_cache SET path = ? WHERE path = ? AND ero = ?',
+                             (new_book, old_book, self.ero))
+            else:
+                conn.execute('UPDATE OR REPLACE episodes SET book = ?, ep = ? WHERE book = ? AND ep = ? AND ero = ? AND exist = 1',
+                             (new_book, new_ep, old_book, old_ep, self.ero))
+                conn.execute('UPDATE OR REPLACE pages SET book = ?, ep = ? WHERE book = ? AND ep = ? AND ero = ?',
+                             (new_book, new_ep, old_book, old_ep, self.ero))
+        return True
 
     def set_book_handle(self, book: str, ep: str, handle: str):
         with self._get_conn() as conn:
@@ -155,11 +327,103 @@ class LocalStorageBackend(StorageBackend):
                 'UPDATE episodes SET rv_handle = ?, exist = 0 WHERE book = ? AND ep = ?',
                 (handle, book, ep)
             )
+            conn.execute('DELETE FROM pages WHERE book = ? AND ep = ? AND ero = ?', (book, ep, self.ero))
 
     def reset_cache(self):
         with self._get_conn() as conn:
             conn.execute('UPDATE episodes SET exist = 0 WHERE ero = ?', (self.ero,))
             conn.execute('DELETE FROM dir_mtime_cache WHERE ero = ?', (self.ero,))
+            conn.execute('DELETE FROM scan_state WHERE ero = ?', (self.ero,))
+            conn.execute('DELETE FROM scan_checkpoint WHERE ero = ?', (self.ero,))
+            conn.execute('DELETE FROM pages WHERE ero = ?', (self.ero,))
+            self._clear_cbz_indexes(conn)
+
+    # ========== 页面列表缓存 ==========
+
+    def load_pages(self, book: str, ep: str) -> Optional[Tuple[float, List[str]]]:
+        with self._get_conn() as conn:
+            row = conn.execute(
+                'SELECT mtime, pages FROM pages WHERE book = ? AND ep = ? AND ero = ?', (book, ep, self.ero)
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def save_pages_batch(self, pages_data: List[Tuple]):
+        if pages_data:
+            with self._get_conn() as conn:
+                self._write_pages(conn, pages_data)
+
+    def _write_pages(self, conn, pages_data: List[Tuple]):
+        conn.executemany(
+            '''INSERT OR REPLACE INTO pages (book, ep, ero, mtime, pages) VALUES (?, ?, ?, ?, ?)''',
+            [(book, ep, self.ero, mtime, json.dumps(pages, ensure_ascii=False, separators=(',', ':')))
+             for book, ep, mtime, pages in pages_data]
+        )
+
+    # ========== CBZ 成员索引 ==========
+
+    def load_cbz_indexes(self, paths: List[str]) -> Dict[str, Tuple[int, int, str]]:
+        result = {}
+        with self._get_conn() as conn:
+            for i in range(0, len(paths), 500):
+                chunk = paths[i:i + 500]
+                rows = conn.execute(
+                    f'SELECT path, size, mtime_ns, members FROM cbz_index WHERE path IN ({",".join("?" * len(chunk))})',
+                    chunk
+                ).fetchall()
+                result.update((path, (size, mtime_ns, members)) for path, size, mtime_ns, members in rows)
+        return result
+
+    def save_cbz_indexes(self, rows: List[Tuple[str, int, int, str]]):
+        if rows:
+            with self._get_conn() as conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO cbz_index (path, size, mtime_ns, members) VALUES (?, ?, ?, ?)', rows
+                )
+
+    def _clear_cbz_indexes(self, conn):
+        # 两个库共用 rV.db：本子库的归档都在 _本子/ 下，按前缀只清理本库的索引
+        ero_prefix = f"_{self._var.doujinshi}/"
+        op = '=' if self.ero else '!='
+        conn.execute(f'DELETE FROM cbz_index WHERE substr(path, 1, ?) {op} ?', (len(ero_prefix), ero_prefix))
+
+    # ========== 搜索 ==========
+
+    def search_books(self, query: str, limit: int, offset: int = 0) -> Optional[List[Tuple[str, str]]]:
+        if not self._fts_available:
+            return None
+        terms = query.split()
+        if not terms:
+            return []
+        sql, params = self._search_query(terms)
+        with self._get_conn() as conn:
+            return conn.execute(sql, (*params, limit, offset)).fetchall()
+
+    def _search_query(self, terms: List[str]) -> Tuple[str, list]:
+        """构造搜索 SQL（末尾留 LIMIT / OFFSET 两个参数），任何情况下都不对 episodes 做全表扫描
+
+        - 有 3 个字符以上的词：trigram MATCH 取候选，短词（trigram 至少需要 3 个字符）只在候选中做 LIKE 过滤
+        - 只有短词：第一个短词按书名前缀走 idx_episodes_book_nocase 的范围查找，其余短词在结果中做 LIKE 过滤
+        """
+        fts_terms = ['"' + t.replace('"', '""') + '"' for t in terms if len(t) >= 3]
+        like_terms = [t for t in terms if len(t) < 3]
+        if fts_terms:
+            where, params = "episodes_fts MATCH ? AND e.exist = 1 AND e.ero = ?", [' AND '.join(fts_terms), self.ero]
+        else:
+            prefix, like_terms = like_terms[0], like_terms[1:]
+            # 上界追加最大码位，NOCASE 下覆盖以 prefix 开头的全部书名
+            where = "e.ero = ? AND e.book >= ? COLLATE NOCASE AND e.book < ? COLLATE NOCASE AND e.exist = 1"
+            params = [self.ero, prefix, prefix + '\U0010ffff']
+        for t in like_terms:
+            where += " AND (e.book || ' ' || e.ep) LIKE ? ESCAPE '\\'"
+            params.append('%' + t.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        if fts_terms:
+            return f"""SELECT e.book, e.ep FROM episodes_fts
+                JOIN episodes e ON e.id = episodes_fts.rowid
+                WHERE {where}
+                ORDER BY episodes_fts.rank, e.book, e.ep LIMIT ? OFFSET ?""", params
+        return f"""SELECT e.book, e.ep FROM episodes e
+                WHERE {where}
+                ORDER BY length(e.book), e.book, e.ep LIMIT ? OFFSET ?""", params
 
     # ========== 目录 mtime 缓存操作 ==========
 
@@ -193,6 +457,15 @@ class LocalStorageBackend(StorageBackend):
                     [(path, mtime, self.ero) for path, mtime in entries]
                 )
 
+    def remove_dir_mtime_cache(self, dir_names: List[str]):
+        """移除已不存在目录的 mtime 缓存"""
+        if dir_names:
+            with self._get_conn() as conn:
+                conn.executemany(
+                    'DELETE FROM dir_mtime_cache WHERE path = ? AND ero = ?',
+                    [(name, self.ero) for name in dir_names]
+                )
+
     def load_all_dir_mtimes(self) -> Dict[str, float]:
         """加载所有目录 mtime 缓存"""
         with self._get_conn() as conn:
@@ -227,13 +500,15 @@ class LocalStorageBackend(StorageBackend):
     def get_static_prefix(self) -> str:
         return f"/static/_{self._var.doujinshi}" if self.ero else "/static"
 
-    def format_pages_for_api(self, book: str, ep: str, pages: List[str]) -> dict:
+    def format_pages_for_api(self, book: str, ep: str, pages: List[str], mtime: Optional[float] = None) -> dict:
         fs_path = f"{book}/{ep}" if ep else book
         safe_path = quote(fs_path)
         prefix = self.get_static_prefix()
 
         if backend.config.cbz_mode:
-            formatted = [f"/comic/cbz_image/{safe_path}.cbz/{quote(page)}" for page in pages]
+            # 带上归档版本号：版本与当前归档一致时 cbz_image 允许 immutable 长期缓存
+            query = f"?v={archive_version(mtime)}" if mtime is not None else ""
+            formatted = [f"/comic/cbz_image/{safe_path}.cbz/{quote(page)}{query}" for page in pages]
         else:
             formatted = [f"{prefix}/{safe_path}/{page}" for page in pages]
 
@@ -17,7 +17,7 @@ from typing import List, Optional, Dict, Tuple
 from urllib.parse import quote
 
 from utils import Var
-from models import BookData
+from models import BookData, BooksIndex
 from .base import StorageBackend
 
 
@@ -110,17 +110,17 @@ class R2StorageBackend(StorageBackend):
         index = self._load_index()
         return len(index.get("books", [])) > 0
 
-    def load_books_from_cache(self) -> Dict[Tuple[str, str], 'BookData']:
+    def load_books_from_cache(self) -> BooksIndex:
         """从索引加载所有书籍"""
         
         index = self._load_index()
-        books_index = {}
+        books_index = BooksIndex()
         for item in index.get("books", []):
             book = item.get("book", "")
             ep = item.get("ep", "")
             mtime = item.get("mtime", 0)
             first_img = item.get("first_img", "")
-            books_index[(book, ep)] = BookData(book, ep, mtime, first_img, self.ero, self)
+            books_index.put(BookData(book, ep, mtime, first_img, self.ero, self))
         return books_index
 
     def save_book_to_cache(self, book: str, ep: str, mtime: float, first_img: str):
@@ -149,7 +149,7 @@ class R2StorageBackend(StorageBackend):
     def get_static_prefix(self) -> str:
         return f"{self.public_url}/_{Var.doujinshi}" if self.ero else self.public_url
 
-    def format_pages_for_api(self, book: str, ep: str, pages: List[str]) -> dict:
+    def format_pages_for_api(self, book: str, ep: str, pages: List[str], mtime: Optional[float] = None) -> dict:
         formatted = [self.get_image_url(book, ep, page) for page in pages]
         return {"pages": formatted, "page_count": len(formatted)}
 
@@ -0,0 +1,58 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""LocalStorageBackend.search_books：结果正确，且短词搜索不对 episodes 做全表扫描"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from storage.local import LocalStorageBackend  # noqa: E402
+
+ROWS = [
+    ("火影忍者", "第1话"), ("火影忍者", "第2话"), ("火影", ""), ("鸣人火影传", ""),
+    ("Naruto", "第1话"), ("海贼王", "第1话"), ("海贼王", "番外"),
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LocalStorageBackend(tmp_path)
+    if not store._fts_available:
+        pytest.skip("SQLite 没有 trigram 分词器")
+    with store._get_conn() as conn:
+        conn.executemany("INSERT INTO episodes (book, ep, ero, mtime) VALUES (?, ?, 0, 0)", ROWS)
+        # 填充无关条目，让查询规划按真实规模选择索引
+        conn.executemany("INSERT INTO episodes (book, ep, ero, mtime) VALUES (?, ?, 0, 0)",
+                         ((f"其他系列{i:05d}", f"第{i % 50}话") for i in range(2000)))
+        conn.execute("ANALYZE")
+    return store
+
+
+def query_plan(store, terms):
+    sql, params = store._search_query(terms)
+    with store._get_conn() as conn:
+        return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", (*params, 50, 0))]
+
+
+def test_long_terms_use_match(store):
+    assert store.search_books("火影忍", 50) == [("火影忍者", "第1话"), ("火影忍者", "第2话")]
+
+
+def test_short_terms_match_book_prefix(store):
+    assert set(store.search_books("火影", 50)) == {("火影", ""), ("火影忍者", "第1话"), ("火影忍者", "第2话")}
+    assert store.search_books("na", 50) == [("Naruto", "第1话")]
+
+
+def test_short_terms_filter_match_results(store):
+    assert store.search_books("海贼王 番", 50) == [("海贼王", "番外")]
+
+
+@pytest.mark.parametrize("query", ["火影", "火 影", "海贼王 番"])
+def test_short_terms_do_not_scan_table(store, query):
+    plan = query_plan(store, query.split())
+    # 全表扫描在 SQLite 3.36 前后分别显示为 "SCAN TABLE episodes AS e" 与 "SCAN e"
+    assert not any(detail == "SCAN e" or detail.startswith("SCAN TABLE episodes ") for detail in plan), plan
+    assert any("idx_episodes_book_nocase" in detail or "episodes_fts" in detail for detail in plan), plan
@@ -0,0 +1,90 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""内存索引基准工具
+
+模拟从 rV.db 加载 books_index，对比旧的 {(book, ep): BookData(__dict__)} 结构
+与 BooksIndex（__slots__ + 字符串驻留）的内存占用和构建耗时。
+
+用法:
+    python tools/bench_index.py --series 2000 --eps 100
+"""
+
+import sys
+import time
+import sqlite3
+import argparse
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models import BookData, BooksIndex  # noqa: E402
+
+
+class LegacyBookData:
+    """旧版 BookData：带实例 __dict__，字符串不驻留"""
+
+    def __init__(self, book, ep, mtime, first_img=None, ero=0, backend=None):
+        self.book = book
+        self.ep = ep
+        self.mtime = mtime
+        self.first_img = first_img
+        self.ero = ero
+        self.backend = backend
+
+
+def build_db(series: int, eps: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE episodes (book TEXT, ep TEXT, mtime REAL, first_img TEXT, ero INTEGER)")
+    conn.executemany(
+        "INSERT INTO episodes VALUES (?, ?, ?, ?, 0)",
+        ((f"某个相当长的系列名称_{s:05d}", f"第{e}话", 1.7e9 + s * eps + e, "001.jpg")
+         for s in range(series) for e in range(1, eps + 1))
+    )
+    return conn
+
+
+def load_legacy(conn, backend):
+    index = {}
+    for book, ep, mtime, first_img, ero in conn.execute("SELECT book, ep, mtime, first_img, ero FROM episodes"):
+        index[(book, ep)] = LegacyBookData(book, ep, mtime, first_img, ero, backend)
+    return index
+
+
+def load_compact(conn, backend):
+    index = BooksIndex()
+    for book, ep, mtime, first_img, ero in conn.execute("SELECT book, ep, mtime, first_img, ero FROM episodes"):
+        index.put(BookData(book, ep, mtime, first_img, ero, backend))
+    return index
+
+
+def measure(loader, conn, backend) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = loader(conn, backend)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(index), current, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='books_index 内存基准测试')
+    parser.add_argument('--series', type=int, default=2000, help='系列数')
+    parser.add_argument('--eps', type=int, default=100, help='每个系列的章节数')
+    args = parser.parse_args()
+
+    conn = build_db(args.series, args.eps)
+    backend = object()  # 所有条目共享同一个 backend 引用
+    print(f"条目数: {args.series * args.eps}")
+    legacy = measure(load_legacy, conn, backend)
+    compact = measure(load_compact, conn, backend)
+    for label, (count, mem, elapsed) in (("before", legacy), ("after", compact)):
+        print(f"{label:<8} entries={count:<8} memory={mem / 1024 / 1024:8.1f} MB  "
+              f"bytes/entry={mem / count:6.0f}  build={elapsed:.3f}s")
+    print(f"memory saved: {(1 - compact[1] / legacy[1]) * 100:.1f}%")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
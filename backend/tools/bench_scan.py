@@ -0,0 +1,93 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""扫描性能基准工具
+
+在临时目录生成合成漫画目录树，对比旧的逐路径串行扫描（collect_book_paths + scan_book）
+与 ScanEngine 按系列并行扫描的吞吐量（图片文件数 / 秒）。
+
+用法:
+    python tools/bench_scan.py --series 500 --eps 20 --pages 30
+    python tools/bench_scan.py --path /mnt/nas/comic   # 直接测量已有目录（只读）
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.mode_strategy import DirectoryModeStrategy  # noqa: E402
+from utils.scan_engine import ScanEngine  # noqa: E402
+
+
+def build_tree(base_path: Path, series: int, eps: int, pages: int) -> int:
+    """生成 series 个系列 × eps 个章节 × pages 张图片，返回图片总数"""
+    for s in range(series):
+        for e in range(1, eps + 1):
+            ep_dir = base_path / f"series_{s:05d}" / f"第{e}话"
+            ep_dir.mkdir(parents=True)
+            for p in range(1, pages + 1):
+                (ep_dir / f"{p:03d}.jpg").touch()
+    return series * eps * pages
+
+
+def count_images(base_path: Path) -> int:
+    return sum(1 for p in base_path.rglob('*') if p.suffix.lower() in {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp'})
+
+
+def bench_serial(strategy, base_path: Path) -> tuple:
+    start = time.perf_counter()
+    books = 0
+    for path in strategy.collect_book_paths(base_path):
+        if strategy.scan_book(path, base_path):
+            books += 1
+    return books, time.perf_counter() - start
+
+
+def bench_engine(strategy, base_path: Path, workers: int) -> tuple:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        engine = ScanEngine(strategy.scan_series, base_path, pool)
+        books = len(engine.scan(strategy.collect_series(base_path)))
+    return books, time.perf_counter() - start
+
+
+def report(label: str, books: int, elapsed: float, files: int):
+    print(f"{label:<10} books={books:<8} time={elapsed:8.3f}s  files/s={files / elapsed:12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='扫描引擎基准测试')
+    parser.add_argument('--path', help='直接测量已有目录（不生成合成数据）')
+    parser.add_argument('--series', type=int, default=300, help='合成系列数')
+    parser.add_argument('--eps', type=int, default=20, help='每个系列的章节数')
+    parser.add_argument('--pages', type=int, default=30, help='每个章节的图片数')
+    parser.add_argument('--workers', type=int, default=32, help='并行扫描线程数')
+    parser.add_argument('--rounds', type=int, default=3, help='每种方式的测量轮数（取最快一轮）')
+    args = parser.parse_args()
+
+    strategy = DirectoryModeStrategy()
+    with tempfile.TemporaryDirectory(prefix='rv_bench_') as tmp:
+        if args.path:
+            base_path = Path(args.path)
+            files = count_images(base_path)
+        else:
+            base_path = Path(tmp)
+            print(f"生成合成目录: {args.series} 系列 × {args.eps} 章节 × {args.pages} 页")
+            files = build_tree(base_path, args.series, args.eps, args.pages)
+        print(f"图片总数: {files}")
+
+        bench_serial(strategy, base_path)  # 预热目录项缓存，避免首轮冷启动偏差
+        serial = min((bench_serial(strategy, base_path) for _ in range(args.rounds)), key=lambda r: r[1])
+        engine = min((bench_engine(strategy, base_path, args.workers) for _ in range(args.rounds)), key=lambda r: r[1])
+        report("before", *serial, files)
+        report("after", *engine, files)
+        print(f"speedup: {serial[1] / engine[1]:.2f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -8,9 +8,8 @@
 
 import pathlib
 import hashlib
-from concurrent.futures import ThreadPoolExecutor
-
 from infra import backend
+from .scheduler import Priority, scheduler
 
 basepath = pathlib.Path(__file__).parent
 
@@ -26,19 +25,25 @@ def md5(string):
     return hashlib.md5(string.encode('utf-8')).hexdigest()
 
 
+def strip_cbz_suffix(name: str) -> str:
+    """去掉末尾的 .cbz 扩展名（不区分大小写），书名与系列名都按此规则得到"""
+    return name[:-4] if name.lower().endswith('.cbz') else name
+
+
 def extract_parent_and_chapter(book_path: pathlib.Path, comic_path: pathlib.Path) -> tuple:
     try:
         rel_path = book_path.relative_to(comic_path)
         if len(rel_path.parts) == 2:
-            parent_name, chapter_name = rel_path.parts[0], rel_path.parts[1].replace('.cbz', '')
+            parent_name, chapter_name = rel_path.parts[0], strip_cbz_suffix(rel_path.parts[1])
             return (parent_name, chapter_name, f"{parent_name}_{chapter_name}")
         elif len(rel_path.parts) == 1:
-            name = rel_path.parts[0].replace('.cbz', '')
+            name = strip_cbz_suffix(rel_path.parts[0])
             return (name, name, name)
         return (book_path.name, book_path.name, book_path.name)
     except (ValueError, IndexError):
-        name = book_path.name.replace('.cbz', '')
+        name = strip_cbz_suffix(book_path.name)
         return (name, name, name)
 
 
-executor = ThreadPoolExecutor(max_workers=12)
+# 向后兼容：旧的全局线程池改为共享调度器的交互优先级视图
+executor = scheduler.executor(Priority.INTERACTIVE)
@@ -4,17 +4,106 @@
 CBZ 文件缓存模块
 
 提供 ZipFile 对象的 LRU 缓存，避免重复打开 .cbz 文件，显著提升性能。
+stored / deflate 成员可按数据区偏移直接流式读取，不经 ZipFile.read 整体载入内存。
+成员位置优先取自持久化的成员索引（utils.cbz_index），冷读取无需解析中央目录，ZipFile 仅作后备。
+按索引读取时经共享只读 fd 做定位读取（os.pread），同一归档的多个成员可被多个线程同时读取，
+不会像 ZipFile 那样在共享文件对象上串行 seek/read。
 """
+import os
+import zlib
+import struct
 import contextlib
 import threading
 import zipfile
 from collections import OrderedDict
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
+from infra import backend
 from core.logging import get_logger
+from utils.cbz_index import LOCAL_HEADER, get_cbz_index, is_streamable, read_member
 
 logger = get_logger()
 
+STREAM_CHUNK_SIZE = 256 * 1024
+_HAS_PREAD = hasattr(os, 'pread')
+
+
+@dataclass(frozen=True)
+class CBZMember:
+    """CBZ 内单个成员的数据区位置，用于绕过 ZipFile 直接读取"""
+    path: str
+    name: str
+    data_offset: int
+    compress_size: int
+    file_size: int
+    compress_type: int
+    crc: int
+    archive_mtime_ns: int  # 定位时 .cbz 的 mtime/大小，读取时校验，防止文件已被替换
+    archive_size: int
+    streamable: bool = True  # 已加密或非 stored/deflate 压缩时为 False，只能经 extract_image 读取
+
+    @property
+    def stored(self) -> bool:
+        return self.compress_type == zipfile.ZIP_STORED
+
+
+class CBZReader:
+    """
+    单个 .cbz 的共享只读 fd，按偏移定位读取
+
+    os.pread 不改变文件位置，多个线程可同时读取同一 fd；没有 os.pread 的平台（Windows）退化为加锁的 lseek + read。
+    被 LRU 淘汰或失效时只标记 retired，fd 在最后一个使用者 release 后才关闭，避免读到被复用的 fd。
+    """
+    __slots__ = ('path', 'stamp', '_fd', '_refs', '_retired', '_lock')
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        st = os.fstat(self._fd)
+        self.stamp = (st.st_mtime_ns, st.st_size)
+        self._refs = 0
+        self._retired = False
+        self._lock = threading.Lock()
+
+    def pread(self, size: int, offset: int) -> bytes:
+        """读取 [offset, offset + size)，遇到文件末尾时返回较短的结果"""
+        if _HAS_PREAD:
+            data = os.pread(self._fd, size, offset)
+            while 0 < len(data) < size and (more := os.pread(self._fd, size - len(data), offset + len(data))):
+                data += more
+            return data
+        with self._lock:
+            os.lseek(self._fd, offset, os.SEEK_SET)
+            chunks, remaining = [], size
+            while remaining > 0 and (chunk := os.read(self._fd, remaining)):
+                chunks.append(chunk)
+                remaining -= len(chunk)
+            return b''.join(chunks)
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if self._retired:
+                return False
+            self._refs += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._refs -= 1
+            close = self._retired and self._refs == 0
+        if close:
+            os.close(self._fd)
+
+    def retire(self):
+        with self._lock:
+            if self._retired:
+                return
+            self._retired = True
+            close = self._refs == 0
+        if close:
+            os.close(self._fd)
+
 
 class CBZCache:
     """
@@ -36,16 +125,32 @@ class CBZCache:
         cache.close_all()
     """
     
-    def __init__(self, max_size: int = 50):
+    DEFAULT_IMAGE_CACHE_BYTES = 128 * 1024 * 1024
+    ADMIT_ON_SECOND_MISS = 1024 * 1024  # 超过此大小的图片第二次未命中才缓存，避免一次性大图挤掉热点
+    GHOST_KEYS = 4096  # 记录近期未命中（未缓存）的键，供二次准入判断
+    MEMBER_ARCHIVES = 256  # 缓存成员数据区位置的归档数
+    MAX_READERS = 128  # 保持打开的共享 fd 数
+
+    def __init__(self, max_size: int = 50, max_image_bytes: int = None):
         """
         初始化缓存
         
         Args:
             max_size: 最大缓存的 ZipFile 数量，默认 50
                      预计内存占用: 50 * 5MB = 250MB (估算)
+            max_image_bytes: 解压后图片字节缓存的预算，默认 128MB；0 表示不缓存
         """
         self.max_size = max_size
-        self._cache = OrderedDict()  # {path_str: ZipFile}
+        # 解压后的图片字节 LRU {(path_str, mtime_ns, name): bytes}，只缓存压缩成员（stored 成员读取无需解压）
+        self.max_image_bytes = self.DEFAULT_IMAGE_CACHE_BYTES if max_image_bytes is None else max_image_bytes
+        self.max_image_item = self.max_image_bytes // 8  # 单张超过预算 1/8 的图片不缓存
+        self._images = OrderedDict()
+        self._image_bytes = 0
+        self._ghosts = OrderedDict()
+        self._image_stats = {'hits': 0, 'misses': 0, 'rejected': 0, 'evictions': 0}
+        self._cache = OrderedDict()  # {path_str: (ZipFile, (mtime_ns, size))}
+        self._members = OrderedDict()  # {path_str: ((mtime_ns, size), {name: CBZMember})}，独立于 ZipFile 按 LRU 淘汰
+        self._readers = OrderedDict()  # {path_str: CBZReader}
         self._lock = threading.RLock()
         self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
         logger.debug(f"CBZCache initialized with max_size={max_size}")
@@ -69,7 +174,7 @@ class CBZCache:
                 self._cache.move_to_end(path_str)
                 self._stats['hits'] += 1
                 logger.trace(f"Cache HIT: {cbz_path.name}")
-                return self._cache[path_str]
+                return self._cache[path_str][0]
             
             # 缓存未命中
             self._stats['misses'] += 1
@@ -83,13 +188,14 @@ class CBZCache:
             # 打开新的 ZipFile
             try:
                 zf = zipfile.ZipFile(cbz_path, 'r')
+                st = os.fstat(zf.fp.fileno())
                 
                 # 如果缓存已满，移除最久未使用的项
                 if len(self._cache) >= self.max_size:
                     self._evict_oldest()
                 
                 # 添加到缓存
-                self._cache[path_str] = zf
+                self._cache[path_str] = (zf, (st.st_mtime_ns, st.st_size))
                 logger.trace(f"Cached new ZipFile: {cbz_path.name}")
                 return zf
                 
@@ -97,9 +203,63 @@ class CBZCache:
                 logger.error(f"Failed to open CBZ file {cbz_path}: {e}")
                 return None
     
+    @contextlib.contextmanager
+    def reader(self, path_str: str, stamp: tuple) -> Iterator[CBZReader]:
+        """
+        借出 path_str 的共享 fd，stamp 为调用方看到的 (mtime_ns, size)
+
+        缓存的 fd 与 stamp 不符（.cbz 已被替换）时重新打开；打开后的文件状态仍与 stamp 不符时抛出 OSError
+        """
+        with self._lock:
+            reader = self._readers.get(path_str)
+            if reader is not None and reader.stamp == stamp and reader.acquire():
+                self._readers.move_to_end(path_str)
+            else:
+                if reader is not None:
+                    self._readers.pop(path_str).retire()
+                reader = CBZReader(path_str)
+                if reader.stamp != stamp:
+                    reader.retire()
+                    raise OSError(f"CBZ changed while reading: {path_str}")
+                reader.acquire()
+                self._readers[path_str] = reader
+                while len(self._readers) > self.MAX_READERS:
+                    self._readers.popitem(last=False)[1].retire()
+        try:
+            yield reader
+        finally:
+            reader.release()
+
+    def iter_member(self, member: CBZMember, start: int = 0, end: Optional[int] = None,
+                    chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        """按块读取成员的 [start, end] 字节（end 含，默认到末尾）
+
+        stored 成员直接从 .cbz 的数据区偏移读取；deflate 成员边读边解压，只支持从头读取
+        """
+        end = member.file_size - 1 if end is None else end
+        with self.reader(member.path, (member.archive_mtime_ns, member.archive_size)) as reader:
+            if member.stored:
+                offset, stop = member.data_offset + start, member.data_offset + end + 1
+                while offset < stop and (chunk := reader.pread(min(chunk_size, stop - offset), offset)):
+                    offset += len(chunk)
+                    yield chunk
+                return
+            decompressor, crc = zlib.decompressobj(-zlib.MAX_WBITS), 0
+            offset, stop = member.data_offset, member.data_offset + member.compress_size
+            while offset < stop and (raw := reader.pread(min(chunk_size, stop - offset), offset)):
+                offset += len(raw)
+                if chunk := decompressor.decompress(raw):
+                    crc = zlib.crc32(chunk, crc)
+                    yield chunk
+            if tail := decompressor.flush():
+                crc = zlib.crc32(tail, crc)
+                yield tail
+            if crc != member.crc:
+                logger.error(f"CRC mismatch for {member.name} in {Path(member.path).name}")
+
     def extract_image(self, cbz_path: Path, image_name: str) -> Optional[bytes]:
         """
-        从缓存的 ZipFile 中提取图片
+        从缓存的 ZipFile 中提取图片，压缩成员的解压结果进入字节缓存
         
         Args:
             cbz_path: .cbz 文件路径
@@ -108,18 +268,165 @@ class CBZCache:
         Returns:
             图片字节数据，失败则返回 None
         """
+        path_str = str(cbz_path.resolve())
+        name = image_name.split('/')[-1]
+        try:
+            st = os.stat(path_str)
+        except OSError:
+            return None
+        key = (path_str, st.st_mtime_ns, name)
+        with self._lock:
+            if (data := self._images.get(key)) is not None:
+                self._images.move_to_end(key)
+                self._image_stats['hits'] += 1
+                return data
+            self._image_stats['misses'] += 1
+
+        index = get_cbz_index().get(path_str)
+        entry = index.members.get(name) if index else None
+        if entry and is_streamable(entry) and index.matches(st):
+            # 按索引经共享 fd 一次定位读取本地文件头与数据，不经 ZipFile
+            try:
+                with self.reader(path_str, (st.st_mtime_ns, st.st_size)) as reader:
+                    data = read_member(reader, entry)
+            except (zipfile.BadZipFile, OSError, struct.error, zlib.error) as e:
+                logger.warning(f"Indexed read of {image_name} from {cbz_path.name} failed, falling back: {e}")
+                get_cbz_index().invalidate(path_str)
+            else:
+                if entry.method != zipfile.ZIP_STORED:
+                    self._admit_image(key, data)
+                return data
+        return self._extract_by_zipfile(cbz_path, path_str, name, key, (st.st_mtime_ns, st.st_size))
+
+    def _extract_by_zipfile(self, cbz_path: Path, path_str: str, name: str, key: tuple, stamp: tuple) -> Optional[bytes]:
+        """后备路径：索引不可用、索引未收录该成员或成员需要 ZipFile 解压（如 bzip2 / lzma）时使用"""
+        with self._lock:
+            if (cached := self._cache.get(path_str)) and cached[1] != stamp:
+                self._remove_from_cache(cbz_path)  # .cbz 已被替换，缓存的 ZipFile 已失效
         zf = self.get_zipfile(cbz_path)
         if not zf:
             return None
         
         try:
-            return zf.read(image_name.split('/')[-1])
-        except (KeyError, RuntimeError, Exception) as e:
-            logger.error(f"Failed to extract {image_name} from {cbz_path.name}: {e}")
+            info = zf.getinfo(name)
+        except KeyError:
+            logger.warning(f"{name} not found in {cbz_path.name}")
+            return None
+        try:
+            data = zf.read(info)
+        except (RuntimeError, Exception) as e:
+            logger.error(f"Failed to extract {name} from {cbz_path.name}: {e}")
             # 如果读取失败，可能是文件损坏，从缓存中移除
             self._remove_from_cache(cbz_path)
             return None
-    
+        if info.compress_type != zipfile.ZIP_STORED:
+            self._admit_image(key, data)
+        return data
+
+    def _admit_image(self, key: tuple, data: bytes):
+        """按大小准入：过大的不缓存，较大的第二次未命中才缓存；超出预算时淘汰最久未用的"""
+        size = len(data)
+        with self._lock:
+            if size > self.max_image_item:
+                self._image_stats['rejected'] += 1
+                return
+            if size > self.ADMIT_ON_SECOND_MISS and key not in self._ghosts:
+                self._ghosts[key] = None
+                if len(self._ghosts) > self.GHOST_KEYS:
+                    self._ghosts.popitem(last=False)
+                self._image_stats['rejected'] += 1
+                return
+            self._ghosts.pop(key, None)
+            if key in self._images:
+                return
+            self._images[key] = data
+            self._image_bytes += size
+            while self._image_bytes > self.max_image_bytes and self._images:
+                _, evicted = self._images.popitem(last=False)
+                self._image_bytes -= len(evicted)
+                self._image_stats['evictions'] += 1
+
+    def get_cached_image(self, member: 'CBZMember') -> Optional[bytes]:
+        """返回已缓存的解压结果（不读取文件），供流式接口优先使用"""
+        key = (member.path, member.archive_mtime_ns, member.name)
+        with self._lock:
+            if (data := self._images.get(key)) is not None:
+                self._images.move_to_end(key)
+                self._image_stats['hits'] += 1
+            return data
+
+    def should_buffer(self, member: 'CBZMember') -> bool:
+        """压缩成员本次是否值得整体解压进缓存（否则流式解压）；较大的成员首次只登记，第二次才返回 True"""
+        size = member.file_size
+        if member.stored or size > self.max_image_item:
+            return False
+        if size <= self.ADMIT_ON_SECOND_MISS:
+            return True
+        key = (member.path, member.archive_mtime_ns, member.name)
+        with self._lock:
+            if key in self._ghosts:
+                return True
+            self._ghosts[key] = None
+            if len(self._ghosts) > self.GHOST_KEYS:
+                self._ghosts.popitem(last=False)
+            self._image_stats['misses'] += 1
+            self._image_stats['rejected'] += 1
+            return False
+
+    def _drop_images(self, path_str: str):
+        with self._lock:
+            for key in [k for k in self._images if k[0] == path_str]:
+                self._image_bytes -= len(self._images.pop(key))
+            for key in [k for k in self._ghosts if k[0] == path_str]:
+                del self._ghosts[key]
+
+    def locate_member(self, cbz_path: Path, image_name: str) -> Optional[CBZMember]:
+        """
+        定位成员的数据区，供流式读取
+
+        Returns:
+            CBZMember，成员不存在时返回 None；已加密或不是 stored/deflate 压缩时 streamable 为 False
+        """
+        path_str = str(cbz_path.resolve())
+        name = image_name.split('/')[-1]
+        try:
+            st = os.stat(path_str)
+        except OSError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._members.get(path_str)
+            if cached and cached[0] != stamp:
+                # .cbz 已被替换：缓存的偏移已失效
+                self._remove_from_cache(cbz_path)
+                cached = None
+            if cached and (member := cached[1].get(name)):
+                self._members.move_to_end(path_str)
+                return member
+        index = get_cbz_index().get(path_str)
+        if index is None or (entry := index.members.get(name)) is None:
+            return None
+        stamp = (index.mtime_ns, index.size)  # 以建立索引时的文件状态为准
+        data_offset = -1
+        if is_streamable(entry):
+            with contextlib.suppress(OSError, struct.error):
+                with self.reader(path_str, stamp) as reader:
+                    header = reader.pread(LOCAL_HEADER.size, entry.header_offset)
+                signature, name_len, extra_len = LOCAL_HEADER.unpack(header)
+                if signature == b'PK\x03\x04':
+                    data_offset = entry.header_offset + LOCAL_HEADER.size + name_len + extra_len
+        member = CBZMember(path_str, name, data_offset, entry.compress_size, entry.file_size, entry.method,
+                           entry.crc, *stamp, streamable=data_offset >= 0)
+        with self._lock:
+            cached = self._members.get(path_str)
+            if not cached or cached[0] != stamp:
+                cached = self._members[path_str] = (stamp, {})
+            cached[1][name] = member
+            self._members.move_to_end(path_str)
+            while len(self._members) > self.MEMBER_ARCHIVES:
+                self._members.popitem(last=False)
+        return member
+
     def _evict_oldest(self):
         """移除最久未使用的 ZipFile"""
         with self._lock:
@@ -127,7 +434,7 @@ class CBZCache:
                 return
             
             # OrderedDict 的第一项是最久未使用的
-            path_str, zf = self._cache.popitem(last=False)
+            path_str, (zf, _) = self._cache.popitem(last=False)
             try:
                 zf.close()
                 self._stats['evictions'] += 1
@@ -140,8 +447,11 @@ class CBZCache:
         path_str = str(cbz_path.resolve())
         
         with self._lock:
+            self._members.pop(path_str, None)
+            if reader := self._readers.pop(path_str, None):
+                reader.retire()
             if path_str in self._cache:
-                zf = self._cache.pop(path_str)
+                zf, _ = self._cache.pop(path_str)
                 try:
                     zf.close()
                     logger.debug(f"Removed from cache: {cbz_path.name}")
@@ -152,23 +462,32 @@ class CBZCache:
         """
         使指定文件的缓存失效
         
-        用于文件被修改时清除缓存
+        用于文件被修改时清除缓存（ZipFile、成员位置与解压后的图片字节）
         
         Args:
             cbz_path: .cbz 文件路径
         """
         self._remove_from_cache(cbz_path)
+        self._drop_images(str(cbz_path.resolve()))
+        get_cbz_index().invalidate(cbz_path)
     
     def close_all(self):
         """关闭所有缓存的 ZipFile"""
         with self._lock:
-            for path_str, zf in self._cache.items():
+            for path_str, (zf, _) in self._cache.items():
                 try:
                     zf.close()
                 except Exception as e:
                     logger.error(f"Error closing ZipFile {path_str}: {e}")
             
             self._cache.clear()
+            for reader in self._readers.values():
+                reader.retire()
+            self._readers.clear()
+            self._members.clear()
+            self._images.clear()
+            self._ghosts.clear()
+            self._image_bytes = 0
             logger.info(f"Closed all cached ZipFiles. Stats: {self._stats}")
     
     def get_stats(self) -> dict:
@@ -176,19 +495,29 @@ class CBZCache:
         获取缓存统计信息
         
         Returns:
-            包含 hits, misses, evictions, size, hit_rate 的字典
+            包含 hits, misses, evictions, size, hit_rate 及 images（解压字节缓存）的字典
         """
         with self._lock:
             total = self._stats['hits'] + self._stats['misses']
             hit_rate = (self._stats['hits'] / total * 100) if total > 0 else 0
+            image_total = self._image_stats['hits'] + self._image_stats['misses']
+            image_hit_rate = (self._image_stats['hits'] / image_total * 100) if image_total > 0 else 0
             
             return {
                 'hits': self._stats['hits'],
                 'misses': self._stats['misses'],
                 'evictions': self._stats['evictions'],
                 'size': len(self._cache),
+                'readers': len(self._readers),
                 'max_size': self.max_size,
-                'hit_rate': f"{hit_rate:.2f}%"
+                'hit_rate': f"{hit_rate:.2f}%",
+                'images': {
+                    **self._image_stats,
+                    'entries': len(self._images),
+                    'bytes': self._image_bytes,
+                    'max_bytes': self.max_image_bytes,
+                    'hit_rate': f"{image_hit_rate:.2f}%"
+                }
             }
     
     def __del__(self):
@@ -205,7 +534,9 @@ def get_cbz_cache() -> CBZCache:
     """获取全局 CBZ 缓存实例"""
     global _global_cbz_cache
     if _global_cbz_cache is None:
-        _global_cbz_cache = CBZCache(max_size=50)
+        image_cache_mb = backend.config.library_cache.get('image_cache_mb')
+        _global_cbz_cache = CBZCache(max_size=50,
+                                     max_image_bytes=None if image_cache_mb is None else image_cache_mb * 1024 * 1024)
     return _global_cbz_cache
 
 
@@ -0,0 +1,273 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+CBZ 成员索引
+
+只解析 ZIP 中央目录，记录每个成员的 (本地文件头偏移, 压缩/原始大小, 压缩方式, CRC)，
+按 .cbz 的大小与 mtime 校验后持久化到 rV.db。扫描、页面列表与图片读取都走索引：
+冷读取一张图片只需一次读取本地文件头 + 数据，不再为每个归档构造 ZipFile。
+"""
+import json
+import os
+import struct
+import threading
+import zipfile
+import zlib
+from collections import OrderedDict, namedtuple
+from pathlib import PurePath
+from typing import Dict, Iterable, Optional
+
+_EOCD = struct.Struct('<4s4H2LH')
+_ZIP64_LOCATOR = struct.Struct('<4sLQL')
+_ZIP64_EOCD = struct.Struct('<4sQ2H2L4Q')
+_CENTRAL_DIR = struct.Struct('<4s4B4HL2L5H2L')
+LOCAL_HEADER = struct.Struct('<4s22xHH')  # 本地文件头 30 字节：签名 ... 文件名长度、扩展字段长度
+_MAX_COMMENT = 0xFFFF
+
+# local_hint：按中央目录估算的本地文件头长度（30 + 文件名 + 扩展字段），读取时据此一次读入文件头与数据
+MemberEntry = namedtuple('MemberEntry', 'header_offset local_hint compress_size file_size method crc flags')
+
+
+class ArchiveIndex:
+    """单个 .cbz 的成员索引 {name: MemberEntry}，size / mtime_ns 为建立索引时的文件状态"""
+    __slots__ = ('path', 'size', 'mtime_ns', 'members')
+
+    def __init__(self, path: str, size: int, mtime_ns: int, members: Dict[str, MemberEntry]):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.members = members
+
+    def matches(self, st: os.stat_result) -> bool:
+        return st.st_size == self.size and st.st_mtime_ns == self.mtime_ns
+
+    def dumps(self) -> str:
+        return json.dumps({name: list(entry) for name, entry in self.members.items()},
+                          ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def loads(cls, path: str, size: int, mtime_ns: int, data: str) -> 'ArchiveIndex':
+        return cls(path, size, mtime_ns, {name: MemberEntry(*entry) for name, entry in json.loads(data).items()})
+
+
+def read_central_directory(path: str) -> Dict[str, MemberEntry]:
+    """解析中央目录（支持 ZIP64 与前置数据），格式异常时抛出 zipfile.BadZipFile"""
+    with open(path, 'rb') as f:
+        file_size = f.seek(0, os.SEEK_END)
+        tail_size = min(file_size, _EOCD.size + _MAX_COMMENT)
+        f.seek(file_size - tail_size)
+        tail = f.read(tail_size)
+        pos = tail.rfind(b'PK\x05\x06')
+        if pos < 0 or len(tail) - pos < _EOCD.size:
+            raise zipfile.BadZipFile(f"End of central directory not found: {path}")
+        _, _, _, _, count, cd_size, cd_offset, _ = _EOCD.unpack_from(tail, pos)
+        eocd_offset = file_size - tail_size + pos
+        zip64_size = 0
+        if count == 0xFFFF or cd_size == 0xFFFFFFFF or cd_offset == 0xFFFFFFFF:
+            f.seek(eocd_offset - _ZIP64_LOCATOR.size)
+            signature, _, zip64_offset, _ = _ZIP64_LOCATOR.unpack(f.read(_ZIP64_LOCATOR.size))
+            if signature != b'PK\x06\x07':
+                raise zipfile.BadZipFile(f"ZIP64 locator not found: {path}")
+            f.seek(zip64_offset)
+            record = _ZIP64_EOCD.unpack(f.read(_ZIP64_EOCD.size))
+            if record[0] != b'PK\x06\x06':
+                raise zipfile.BadZipFile(f"ZIP64 end of central directory not found: {path}")
+            count, cd_size, cd_offset = record[7], record[8], record[9]
+            zip64_size = _ZIP64_EOCD.size + _ZIP64_LOCATOR.size
+        # 前置了其他数据（如自解压头）时，偏移整体后移
+        concat = eocd_offset - zip64_size - cd_size - cd_offset
+        f.seek(cd_offset + concat)
+        directory = f.read(cd_size)
+
+    members = {}
+    pos = 0
+    for _ in range(count):
+        if pos + _CENTRAL_DIR.size > len(directory):
+            raise zipfile.BadZipFile(f"Truncated central directory: {path}")
+        (signature, _, _, _, _, flags, method, _, _, crc, compress_size, file_size,
+         name_len, extra_len, comment_len, _, _, _, header_offset) = _CENTRAL_DIR.unpack_from(directory, pos)
+        if signature != b'PK\x01\x02':
+            raise zipfile.BadZipFile(f"Bad central directory entry: {path}")
+        pos += _CENTRAL_DIR.size
+        raw_name = directory[pos:pos + name_len]
+        extra = directory[pos + name_len:pos + name_len + extra_len]
+        pos += name_len + extra_len + comment_len
+        name = raw_name.decode('utf-8' if flags & 0x800 else 'cp437')
+        if 0xFFFFFFFF in (compress_size, file_size, header_offset):
+            file_size, compress_size, header_offset = _zip64_extra(extra, file_size, compress_size, header_offset)
+        members[name] = MemberEntry(header_offset + concat, LOCAL_HEADER.size + name_len + extra_len,
+                                    compress_size, file_size, method, crc, flags)
+    return members
+
+
+def _zip64_extra(extra: bytes, file_size: int, compress_size: int, header_offset: int) -> tuple:
+    pos = 0
+    while pos + 4 <= len(extra):
+        tag, size = struct.unpack_from('<HH', extra, pos)
+        if tag == 0x0001:
+            values = iter(struct.unpack_from(f'<{size // 8}Q', extra, pos + 4))
+            if file_size == 0xFFFFFFFF:
+                file_size = next(values)
+            if compress_size == 0xFFFFFFFF:
+                compress_size = next(values)
+            if header_offset == 0xFFFFFFFF:
+                header_offset = next(values)
+            break
+        pos += 4 + size
+    return file_size, compress_size, header_offset
+
+
+def st_mtime_from_ns(mtime_ns: int) -> float:
+    """按 os.stat 计算 st_mtime 的方式由 st_mtime_ns 得到同一个浮点值"""
+    sec, nsec = divmod(mtime_ns, 1_000_000_000)
+    return sec + nsec * 1e-9
+
+
+def archive_version(mtime: float) -> str:
+    """页面 URL 中的版本号（归档 mtime，毫秒），归档被替换后 URL 随之变化，可放心长期缓存"""
+    return f"{round(mtime * 1000):x}"
+
+
+def is_streamable(entry: MemberEntry) -> bool:
+    """未加密且为 stored / deflate 压缩的成员可绕过 ZipFile 直接读取"""
+    return not entry.flags & 0x1 and entry.method in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED)
+
+
+def read_member(reader, entry: MemberEntry) -> bytes:
+    """一次定位读取本地文件头与数据并按需解压；reader 需提供 pread(size, offset) 与 path。CRC 不符时抛出 zipfile.BadZipFile"""
+    buf = reader.pread(entry.local_hint + entry.compress_size, entry.header_offset)
+    if len(buf) < LOCAL_HEADER.size:
+        raise zipfile.BadZipFile(f"Truncated local file header: {reader.path}")
+    signature, name_len, extra_len = LOCAL_HEADER.unpack_from(buf)
+    if signature != b'PK\x03\x04':
+        raise zipfile.BadZipFile(f"Bad local file header: {reader.path}")
+    start = LOCAL_HEADER.size + name_len + extra_len
+    data = buf[start:start + entry.compress_size]
+    if len(data) < entry.compress_size:
+        # 本地扩展字段比中央目录中的长，补读剩余数据
+        data += reader.pread(entry.compress_size - len(data), entry.header_offset + start + len(data))
+    if entry.method == zipfile.ZIP_DEFLATED:
+        data = zlib.decompress(data, -zlib.MAX_WBITS)
+    if zlib.crc32(data) != entry.crc:
+        raise zipfile.BadZipFile(f"CRC mismatch in {reader.path}")
+    return data
+
+
+class CBZIndexCache:
+    """
+    成员索引的内存 LRU + rV.db 持久化
+
+    各库的 StorageBackend 通过 register 登记自己的根目录，索引按相对根目录的路径落库到该库的 rV.db，
+    库关闭时 unregister 注销，不再持有其引用；未登记的路径只在内存中缓存。扫描时使用 remember=False，避免大批量归档挤占内存 LRU。
+    """
+    MAX_ARCHIVES = 1024
+
+    def __init__(self, max_archives: int = MAX_ARCHIVES):
+        self.max_archives = max_archives
+        self._lru: "OrderedDict[str, ArchiveIndex]" = OrderedDict()
+        self._stores = {}  # {root_str: [StorageBackend, ...]}，同一根目录可由多个库（ero 0/1）共同登记，取最近登记者
+        self._lock = threading.RLock()
+        self._stats = {'hits': 0, 'db_hits': 0, 'parsed': 0}
+
+    def register(self, root, store):
+        with self._lock:
+            # 同时登记真实路径，经符号链接访问（CBZCache 使用 resolve 后的路径）时也能落库
+            for root_str in {os.path.abspath(root), os.path.realpath(root)}:
+                self._stores.setdefault(root_str, []).append(store)
+
+    def unregister(self, root, store):
+        """注销 register 登记的 store；该根目录已无登记者时移除，其下路径此后只在内存中缓存"""
+        with self._lock:
+            for root_str in {os.path.abspath(root), os.path.realpath(root)}:
+                stores = self._stores.get(root_str, [])
+                if store in stores:
+                    stores.remove(store)
+                if not stores:
+                    self._stores.pop(root_str, None)
+
+    def _store_for(self, path_str: str) -> tuple:
+        with self._lock:
+            for root, stores in self._stores.items():
+                if path_str.startswith(root + os.sep):
+                    return stores[-1], PurePath(path_str[len(root) + 1:]).as_posix()
+        return None, None
+
+    def get(self, cbz_path, remember: bool = True) -> Optional[ArchiveIndex]:
+        path_str = os.path.abspath(cbz_path)
+        return self.get_many([path_str], remember).get(path_str)
+
+    def get_many(self, paths: Iterable[str], remember: bool = False) -> Dict[str, ArchiveIndex]:
+        """批量取得索引（paths 为绝对路径）：内存命中 -> rV.db 命中 -> 解析中央目录并落库；无法读取的归档不在结果中"""
+        result, missing = {}, {}
+        for path_str in paths:
+            try:
+                st = os.stat(path_str)
+            except OSError:
+                continue
+            with self._lock:
+                index = self._lru.get(path_str)
+                if index is not None and index.matches(st):
+                    self._lru.move_to_end(path_str)
+                    self._stats['hits'] += 1
+                    result[path_str] = index
+                    continue
+            missing[path_str] = st
+
+        by_store = {}
+        for path_str in missing:
+            store, rel = self._store_for(path_str)
+            by_store.setdefault(store, []).append((path_str, rel))
+        for store, items in by_store.items():
+            stored = {}
+            if store is not None:
+                try:
+                    stored = store.load_cbz_indexes([rel for _, rel in items])
+                except Exception:
+                    stored = {}
+            new_rows = []
+            for path_str, rel in items:
+                st = missing[path_str]
+                row = stored.get(rel)
+                if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+                    index = ArchiveIndex.loads(path_str, st.st_size, st.st_mtime_ns, row[2])
+                    self._stats['db_hits'] += 1
+                else:
+                    try:
+                        index = ArchiveIndex(path_str, st.st_size, st.st_mtime_ns, read_central_directory(path_str))
+                    except (zipfile.BadZipFile, OSError, struct.error, UnicodeDecodeError):
+                        continue
+                    self._stats['parsed'] += 1
+                    if rel is not None:
+                        new_rows.append((rel, index.size, index.mtime_ns, index.dumps()))
+                result[path_str] = index
+                if remember:
+                    self._remember(index)
+            if new_rows:
+                try:
+                    store.save_cbz_indexes(new_rows)
+                except Exception:
+                    pass
+        return result
+
+    def _remember(self, index: ArchiveIndex):
+        with self._lock:
+            self._lru[index.path] = index
+            self._lru.move_to_end(index.path)
+            while len(self._lru) > self.max_archives:
+                self._lru.popitem(last=False)
+
+    def invalidate(self, cbz_path):
+        with self._lock:
+            self._lru.pop(os.path.abspath(cbz_path), None)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, 'size': len(self._lru), 'max_archives': self.max_archives}
+
+
+_global_cbz_index = CBZIndexCache()
+
+
+def get_cbz_index() -> CBZIndexCache:
+    """获取全局 CBZ 成员索引"""
+    return _global_cbz_index
@@ -6,24 +6,64 @@ import re
 import zipfile
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
-from . import extract_parent_and_chapter
+from . import extract_parent_and_chapter, strip_cbz_suffix
 from .butils import IMAGE_EXTENSIONS
+from .cbz_index import get_cbz_index
 from infra import backend
 
 expect_dir_regex = re.compile(r"^_")
 accpect_dir = lambda _: not bool(expect_dir_regex.search(_))
 
 
+def is_image_name(name: str) -> bool:
+    """基于纯字符串判断图片文件名，不构造 Path"""
+    dot = name.rfind('.')
+    return dot > 0 and not name.startswith('.') and name[dot:].lower() in IMAGE_EXTENSIONS
+
+
+def images_in_dir(dir_path: str) -> List[str]:
+    """返回目录内排序后的全部图片名，与 scan_book(return_all=True) 的页面列表一致"""
+    with os.scandir(dir_path) as entries:
+        return sorted(entry.name for entry in entries if is_image_name(entry.name) and entry.is_file())
+
+
+def first_image_in_dir(dir_path: str) -> Optional[str]:
+    """返回目录内排序最小的图片名，利用 d_type 判断文件类型"""
+    first = None
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            name = entry.name
+            if (first is None or name < first) and is_image_name(name) and entry.is_file():
+                first = name
+    return first
+
+
 class ModeStrategy(ABC):
     @abstractmethod
     def collect_book_paths(self, comic_path: Path) -> List[Path]:
         """收集所有书籍路径"""
     
+    @abstractmethod
+    def collect_series(self, comic_path: Path) -> Dict[str, float]:
+        """收集顶层系列及其 mtime，返回 {series_name: mtime}"""
+
+    @abstractmethod
+    def collect_series_book_paths(self, comic_path: Path, series: str) -> List[Path]:
+        """收集单个顶层系列下的书籍路径，与 collect_book_paths 结果一致"""
+
     @abstractmethod
     def scan_book(self, book_path: Path, comic_path: Path, return_all: bool = False) -> Optional[Tuple]:
         """扫描单个书籍，返回 (display_name, parent_name, chapter_name, mtime, first_img/pages)"""
+
+    @abstractmethod
+    def scan_series(self, comic_path: str, series: str, return_all: bool = False) -> List[Tuple[str, str, float, str]]:
+        """扫描单个顶层系列，返回紧凑元组 [(book, ep, mtime, first_img), ...]
+
+        与逐个 collect_book_paths + scan_book 的结果一致，但只使用字符串路径；
+        return_all 为 True 时第 4 项为完整页面列表（同 scan_book）
+        """
     
     @abstractmethod
     def build_handle_path(self, scan_path: Path, book_name: str, ep_name: str) -> Path:
@@ -68,6 +108,26 @@ class DirectoryModeStrategy(ModeStrategy):
                         else:
                             all_paths.append(Path(entry.path))
         return all_paths
+
+    def collect_series(self, comic_path: Path) -> Dict[str, float]:
+        series = {}
+        with contextlib.suppress(OSError):
+            with os.scandir(comic_path) as entries:
+                for entry in entries:
+                    if entry.is_dir() and accpect_dir(entry.name):
+                        with contextlib.suppress(OSError):
+                            series[entry.name] = entry.stat().st_mtime
+        return series
+
+    def collect_series_book_paths(self, comic_path: Path, series: str) -> List[Path]:
+        series_path = comic_path / series
+        subdirs = []
+        with contextlib.suppress(OSError):
+            with os.scandir(series_path) as sub_entries:
+                subdirs = [Path(e.path) for e in sub_entries if e.is_dir()]
+        if subdirs:
+            return subdirs
+        return [series_path] if series_path.is_dir() else []
     
     def scan_book(self, book_path: Path, comic_path: Path, return_all: bool = False) -> Optional[Tuple]:
         if not book_path.is_dir():
@@ -91,7 +151,30 @@ class DirectoryModeStrategy(ModeStrategy):
             return None
 
 
+    def scan_series(self, comic_path: str, series: str, return_all: bool = False) -> List[Tuple[str, str, float, str]]:
+        # 列出全部图片与只找首图都要遍历整个目录，return_all 不增加 IO
+        scan_dir = images_in_dir if return_all else first_image_in_dir
+        series_path = os.path.join(comic_path, series)
+        subdirs = []
+        with os.scandir(series_path) as entries:
+            subdirs = [entry for entry in entries if entry.is_dir()]
+        if not subdirs:
+            if pages := scan_dir(series_path):
+                return [(series, "", os.stat(series_path).st_mtime, pages)]
+            return []
+        rows = []
+        for entry in subdirs:
+            with contextlib.suppress(OSError):
+                if pages := scan_dir(entry.path):
+                    ep = "" if entry.name == series else entry.name
+                    rows.append((series, ep, entry.stat().st_mtime, pages))
+        return rows
+
+
 class CBZModeStrategy(ModeStrategy):
+    def __init__(self):
+        self._singles = {}  # {comic_path: (目录 mtime_ns, {series: 顶层 .cbz 文件名})}
+
     @property
     def name(self) -> str:
         return "CBZ (.cbz files)"
@@ -104,12 +187,14 @@ class CBZModeStrategy(ModeStrategy):
     
     def invalidate_cache(self, book_path: Path):
         from utils.cbz_cache import get_cbz_cache
-        cbz_cache = get_cbz_cache()
+        cbz_cache, cbz_index = get_cbz_cache(), get_cbz_index()
         if book_path.suffix.lower() == '.cbz':
             cbz_cache.invalidate(book_path)
+            cbz_index.invalidate(book_path)
         elif book_path.is_dir():
             for cbz in book_path.glob('*.cbz'):
                 cbz_cache.invalidate(cbz)
+                cbz_index.invalidate(cbz)
     
     def collect_book_paths(self, comic_path: Path) -> List[Path]:
         all_paths = []
@@ -125,20 +210,63 @@ class CBZModeStrategy(ModeStrategy):
                                     if sub_entry.is_file() and sub_entry.name.lower().endswith('.cbz'):
                                         all_paths.append(Path(sub_entry.path))
         return all_paths
+
+    def collect_series(self, comic_path: Path) -> Dict[str, float]:
+        # 顶层 .cbz 以去掉扩展名（不区分大小写）后的名字作为系列名，与 extract_parent_and_chapter 解析出的 book 一致
+        series = {}
+        with contextlib.suppress(OSError):
+            with os.scandir(comic_path) as entries:
+                for entry in entries:
+                    is_cbz = entry.is_file() and entry.name.lower().endswith('.cbz')
+                    if is_cbz or (entry.is_dir() and accpect_dir(entry.name)):
+                        name = strip_cbz_suffix(entry.name) if is_cbz else entry.name
+                        with contextlib.suppress(OSError):
+                            series[name] = max(series.get(name, 0), entry.stat().st_mtime)
+        return series
+
+    def _single_file(self, comic_path: str, series: str) -> Optional[str]:
+        """系列对应的顶层 .cbz 路径，扩展名不区分大小写"""
+        single = os.path.join(comic_path, f"{series}.cbz")
+        if os.path.isfile(single):
+            return single
+        try:
+            mtime_ns = os.stat(comic_path).st_mtime_ns
+        except OSError:
+            return None
+        # 大小写不同的扩展名需要列目录；按顶层目录 mtime 缓存，避免每个系列都遍历一次
+        cached = self._singles.get(comic_path)
+        if cached is None or cached[0] != mtime_ns:
+            singles = {}
+            with contextlib.suppress(OSError):
+                with os.scandir(comic_path) as entries:
+                    for entry in entries:
+                        if entry.name.lower().endswith('.cbz') and entry.is_file():
+                            singles[strip_cbz_suffix(entry.name)] = entry.name
+            cached = self._singles[comic_path] = (mtime_ns, singles)
+        name = cached[1].get(series)
+        return os.path.join(comic_path, name) if name else None
+
+    def collect_series_book_paths(self, comic_path: Path, series: str) -> List[Path]:
+        all_paths = []
+        if single := self._single_file(str(comic_path), series):
+            all_paths.append(Path(single))
+        with contextlib.suppress(OSError):
+            with os.scandir(comic_path / series) as sub_entries:
+                for sub_entry in sub_entries:
+                    if sub_entry.is_file() and sub_entry.name.lower().endswith('.cbz'):
+                        all_paths.append(Path(sub_entry.path))
+        return all_paths
     
     def scan_book(self, book_path: Path, comic_path: Path, return_all: bool = False) -> Optional[Tuple]:
         if not (book_path.is_file() and book_path.suffix.lower() == '.cbz'):
             return None
         try:
-            from utils.cbz_cache import get_cbz_cache
             mtime = book_path.stat().st_mtime
-            zf = get_cbz_cache().get_zipfile(book_path)
-            if not zf:
+            # 成员索引（rV.db 持久化）命中时无需打开 ZipFile
+            index = get_cbz_index().get(book_path)
+            if index is None:
                 return None
-            entries = [name for name in zf.namelist()
-                      if not name.endswith('/') and Path(name).suffix.lower() in IMAGE_EXTENSIONS
-                      and not Path(name).name.startswith('.')]
-            entries.sort()
+            entries = self._image_names(index.members)
             if not entries:
                 return None
             pages = entries if return_all else entries[0]
@@ -148,6 +276,43 @@ class CBZModeStrategy(ModeStrategy):
             return None
 
 
+    @staticmethod
+    def _image_names(names) -> List[str]:
+        return sorted(name for name in names
+                      if not name.endswith('/') and is_image_name(name.rsplit('/', 1)[-1]))
+
+    @classmethod
+    def _cbz_images(cls, cbz_path: str) -> List[str]:
+        # 扫描期间不进入内存 LRU，避免大批量归档挤占缓存；索引仍会落库
+        index = get_cbz_index().get(cbz_path, remember=False)
+        return cls._image_names(index.members) if index else []
+
+    @classmethod
+    def _first_cbz_image(cls, cbz_path: str) -> Optional[str]:
+        names = cls._cbz_images(cbz_path)
+        return names[0] if names else None
+
+    def scan_series(self, comic_path: str, series: str, return_all: bool = False) -> List[Tuple[str, str, float, str]]:
+        candidates = []
+        if single := self._single_file(comic_path, series):
+            candidates.append((single, series, ""))
+        with contextlib.suppress(FileNotFoundError, NotADirectoryError):
+            with os.scandir(os.path.join(comic_path, series)) as entries:
+                for entry in entries:
+                    if entry.name.lower().endswith('.cbz') and entry.is_file():
+                        chapter = strip_cbz_suffix(entry.name)
+                        candidates.append((entry.path, series, "" if chapter == series else chapter))
+        # 整个系列的索引一次批量读取 rV.db，未命中的才解析中央目录
+        indexes = get_cbz_index().get_many([os.path.abspath(cbz_path) for cbz_path, _, _ in candidates])
+        rows = []
+        for cbz_path, book, ep in candidates:
+            index = indexes.get(os.path.abspath(cbz_path))
+            if index and (pages := self._image_names(index.members)):
+                with contextlib.suppress(OSError):
+                    rows.append((book, ep, os.stat(cbz_path).st_mtime, pages if return_all else pages[0]))
+        return rows
+
+
 class ModeStrategyFactory:
     @staticmethod
     def create(comic_path: Path) -> ModeStrategy:
@@ -0,0 +1,72 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+扫描引擎模块
+
+以顶层系列目录为单位，在有界线程池中并行扫描书籍。
+每个任务只使用 os.scandir 的 d_type 信息和字符串路径，结果为紧凑元组
+(book, ep, mtime, first_img)，避免逐条构造 Path。
+"""
+import os
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+ScanRow = Tuple[str, str, float, str]
+
+
+class ScanEngine:
+    """
+    按系列并行扫描
+
+    使用示例:
+        engine = ScanEngine(backend.scan_series, scan_path, executor)
+        for series, rows in engine.iter_scan(series_names):
+            ...
+    """
+
+    def __init__(self, scan_func: Callable[[str, str], List[ScanRow]], scan_path, executor: Executor,
+                 max_inflight: int = None):
+        """
+        Args:
+            scan_func: 扫描单个系列的函数，签名 (scan_path: str, series: str) -> [ScanRow]
+            scan_path: 扫描根目录
+            executor: 执行扫描任务的线程池
+            max_inflight: 同时提交的最大任务数，默认为 CPU 数的 4 倍
+        """
+        self.scan_func = scan_func
+        self.scan_path = str(scan_path)
+        self.executor = executor
+        self.max_inflight = max_inflight or min(64, (os.cpu_count() or 4) * 4)
+
+    def _scan_one(self, series: str) -> List[ScanRow]:
+        try:
+            return self.scan_func(self.scan_path, series)
+        except OSError:
+            # 系列目录在扫描期间被删除或无权限访问，视为空系列
+            return []
+
+    def iter_scan(self, series_names: Iterable[str]) -> Iterator[Tuple[str, List[ScanRow]]]:
+        """按完成顺序产出 (series, rows)，在途任务数不超过 max_inflight"""
+        names = iter(series_names)
+        pending = {}
+
+        def fill():
+            for series in names:
+                pending[self.executor.submit(self._scan_one, series)] = series
+                if len(pending) >= self.max_inflight:
+                    return
+
+        try:
+            fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+                fill()
+        finally:
+            # 调用方提前结束迭代（如扫描被取消）时丢弃尚未开始的任务
+            for future in pending:
+                future.cancel()
+
+    def scan(self, series_names: Iterable[str]) -> List[ScanRow]:
+        return [row for _, rows in self.iter_scan(series_names) for row in rows]
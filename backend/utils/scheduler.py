@@ -0,0 +1,171 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+优先级调度模块
+
+所有阻塞任务共用一组工作线程，按优先级分类并对每类限制并发数，
+保证后台扫描/同步再多也不会占满线程、拖慢交互请求。
+"""
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future
+from enum import IntEnum
+from typing import Callable, Dict, Optional
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # 用户正在等待的请求：页面列表、CBZ 图片
+    PREFETCH = 1  # 预读取：预测用户接下来会访问的内容
+    BACKGROUND = 2  # 后台扫描与增量同步
+    MAINTENANCE = 3  # 维护任务：文件 handle 操作
+    ORCHESTRATION = 4  # 扫描编排：整个扫描期间占着线程等待 BACKGROUND 分块任务，单独限额，不与 handle 操作争抢名额
+
+
+class PriorityScheduler:
+    """
+    带优先级和分类并发上限的共享线程池
+
+    空闲线程总是先取优先级最高、且未达到并发上限的分类中的任务；
+    低优先级分类的上限之和小于线程总数，交互请求始终有可用线程。
+
+    使用示例:
+        result = await scheduler.run(Priority.INTERACTIVE, func, arg)
+        future = scheduler.submit(Priority.BACKGROUND, func, arg)
+        loop.run_in_executor(scheduler.executor(Priority.BACKGROUND), func, arg)
+    """
+
+    DEFAULT_CAPS = {
+        Priority.INTERACTIVE: None,  # 不超过 max_workers
+        Priority.PREFETCH: 4,
+        Priority.BACKGROUND: 8,
+        Priority.MAINTENANCE: 2,
+        Priority.ORCHESTRATION: 4,  # 两个库各自的初始扫描/同步与一次强制重扫可同时进行
+    }
+
+    def __init__(self, max_workers: int = 24, caps: Optional[Dict[Priority, int]] = None):
+        self.max_workers = max_workers
+        caps = {**self.DEFAULT_CAPS, **(caps or {})}
+        self.caps = {p: min(cap or max_workers, max_workers) for p, cap in caps.items()}
+        self._queues = {p: deque() for p in Priority}
+        self._running = {p: 0 for p in Priority}
+        self._completed = {p: 0 for p in Priority}
+        self._cond = threading.Condition()
+        self._threads = []
+        self._idle = 0
+        self._shutdown = False
+        self._executors = {p: _PriorityExecutor(self, p) for p in Priority}
+
+    def submit(self, priority: Priority, fn: Callable, *args, **kwargs) -> Future:
+        future = Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new tasks after shutdown")
+            self._queues[priority].append((future, fn, args, kwargs))
+            if self._idle < self._runnable() and len(self._threads) < self.max_workers:
+                self._spawn_worker()
+            self._cond.notify()
+        return future
+
+    async def run(self, priority: Priority, fn: Callable, *args, **kwargs):
+        """在调度器中执行并等待结果；协程被取消时，尚未开始的任务也随之取消"""
+        return await asyncio.wrap_future(self.submit(priority, fn, *args, **kwargs))
+
+    def executor(self, priority: Priority) -> Executor:
+        """返回绑定到指定优先级的 Executor，供 run_in_executor / ScanEngine 等使用"""
+        return self._executors[priority]
+
+    def _spawn_worker(self):
+        thread = threading.Thread(target=self._worker, name=f"rv-worker-{len(self._threads)}", daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def _runnable(self) -> int:
+        """当前可立即运行的排队任务数（受分类上限约束），调用方需持有 _cond"""
+        return sum(min(len(self._queues[p]), max(0, self.caps[p] - self._running[p])) for p in Priority)
+
+    def _next_task(self):
+        """取出可运行的最高优先级任务，调用方需持有 _cond"""
+        for priority in Priority:
+            if self._queues[priority] and self._running[priority] < self.caps[priority]:
+                return priority, self._queues[priority].popleft()
+        return None, None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                priority, task = self._next_task()
+                while task is None:
+                    if self._shutdown:
+                        return
+                    self._idle += 1
+                    self._cond.wait()
+                    self._idle -= 1
+                    priority, task = self._next_task()
+                self._running[priority] += 1
+
+            future, fn, args, kwargs = task
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args, **kwargs))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._running[priority] -= 1
+                    self._completed[priority] += 1
+                    # 释放的名额可能让其他分类的排队任务变为可运行
+                    self._cond.notify_all()
+
+    def get_stats(self) -> dict:
+        """
+        获取调度统计信息
+
+        Returns:
+            每个优先级的 queued, running, completed, cap，以及线程数
+        """
+        with self._cond:
+            return {
+                'workers': len(self._threads),
+                'max_workers': self.max_workers,
+                'classes': {
+                    p.name.lower(): {
+                        'queued': len(self._queues[p]),
+                        'running': self._running[p],
+                        'completed': self._completed[p],
+                        'cap': self.caps[p],
+                    } for p in Priority
+                },
+            }
+
+    def queue_depth(self, priority: Priority) -> int:
+        with self._cond:
+            return len(self._queues[priority])
+
+    def shutdown(self, cancel_futures: bool = True):
+        with self._cond:
+            self._shutdown = True
+            if cancel_futures:
+                for queue in self._queues.values():
+                    while queue:
+                        queue.popleft()[0].cancel()
+            self._cond.notify_all()
+
+
+class _PriorityExecutor(Executor):
+    """固定优先级的 Executor 视图；共享线程池的生命周期由调度器管理，shutdown 为空操作"""
+
+    def __init__(self, scheduler: PriorityScheduler, priority: Priority):
+        self._scheduler = scheduler
+        self._priority = priority
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        return self._scheduler.submit(self._priority, fn, *args, **kwargs)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        pass
+
+
+# 全局调度器实例
+scheduler = PriorityScheduler()